@@ -1,6 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import pandas as pd
+
+# Opt-in pandas Copy-on-Write: the dataset cache then hands out views instead of deep copies
+if os.getenv("PANDAS_COPY_ON_WRITE", "0") == "1":
+    pd.set_option("mode.copy_on_write", True)
 
 from app.api.routers import data, eda, features, training, evaluation, chat
 
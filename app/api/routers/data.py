@@ -1,35 +1,137 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-import shutil
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import Optional
 import os
-import pandas as pd
 from app.api.schemas import DataUploadResponse
+from app.core.utils import ingest, uploads, memory_profile
+from app.core.utils.dataset_cache import load_dataset
 
 router = APIRouter(prefix="/data", tags=["data"])
 
 DATA_DIR = "app/data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
+class UploadStartRequest(BaseModel):
+    filename: str
+    total_size: Optional[int] = None
+
+class MemoryProfileRequest(BaseModel):
+    filename: str
+
+async def _finalize(upload_id: str) -> DataUploadResponse:
+    # File moves, Parquet conversion and schema reads run off the event loop
+    result = await run_in_threadpool(uploads.complete_upload, upload_id, DATA_DIR)
+    file_location = await run_in_threadpool(ingest.ingest_upload, result["filepath"], result["fingerprint"])
+
+    # Columns for immediate feedback, from the stored schema (no data is read)
+    schema = await run_in_threadpool(ingest.read_schema, file_location)
+
+    return DataUploadResponse(
+        filename=os.path.basename(file_location),
+        filepath=file_location,
+        columns=schema["columns"],
+        rows=schema["rows"],
+        message="File uploaded successfully"
+    )
+
 @router.post("/upload", response_model=DataUploadResponse)
 async def upload_data(file: UploadFile = File(...)):
     try:
-        file_location = f"{DATA_DIR}/{file.filename}"
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Read columns for immediate feedback
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file_location, nrows=5)
-        elif file.filename.endswith('.parquet'):
-            df = pd.read_parquet(file_location) # parquet usually reads schema easily
-            df = df.head(5)
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file format. Please upload CSV or Parquet.")
-
-        return DataUploadResponse(
-            filename=file.filename,
-            filepath=file_location,
-            columns=df.columns.tolist(),
-            message="File uploaded successfully"
-        )
+        upload = uploads.start_upload(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # Copy in chunks without blocking the event loop; the schema is checked after the first MB
+        offset = 0
+        while chunk := await file.read(uploads.CHUNK_BYTES):
+            await run_in_threadpool(uploads.append_part, upload["upload_id"], offset, chunk)
+            offset += len(chunk)
+        return await _finalize(upload["upload_id"])
+    except ValueError as e:
+        uploads.abort_upload(upload["upload_id"])
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        uploads.abort_upload(upload["upload_id"])
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Resumable uploads: start, PUT parts at byte offsets (GET the session to learn where to resume), complete.
+
+@router.post("/uploads")
+async def start_upload(request: UploadStartRequest):
+    try:
+        return uploads.start_upload(request.filename, request.total_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    state = uploads.get_upload(upload_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return state
+
+@router.put("/uploads/{upload_id}")
+async def upload_part(upload_id: str, offset: int, request: Request):
+    """
+    Appends the raw request body at byte `offset`. Returns the upload state,
+    including "received" (the next offset) and the sniffed "schema".
+    """
+    state = uploads.get_upload(upload_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if offset != state["received"]:
+        raise HTTPException(status_code=409, detail=f"Resume from offset {state['received']}")
+    try:
+        buffer = bytearray()
+        async for data in request.stream():
+            buffer += data
+            if len(buffer) >= uploads.CHUNK_BYTES:
+                state = await run_in_threadpool(uploads.append_part, upload_id, offset, bytes(buffer))
+                offset += len(buffer)
+                buffer = bytearray()
+        if buffer:
+            state = await run_in_threadpool(uploads.append_part, upload_id, offset, bytes(buffer))
+        return state
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/uploads/{upload_id}/complete", response_model=DataUploadResponse)
+async def complete_upload(upload_id: str):
+    try:
+        return await _finalize(upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    uploads.abort_upload(upload_id)
+    return {"upload_id": upload_id, "status": "aborted"}
+
+@router.post("/memory-profile")
+async def memory_profile_report(request: MemoryProfileRequest):
+    """
+    Loads the dataset with the compact profile (choosing and storing its dtypes on first use)
+    and returns the dtype chosen and memory saved for every column.
+    """
+    filepath = f"{DATA_DIR}/{request.filename}"
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        await run_in_threadpool(load_dataset, filepath, profile="compact")
+        profile = memory_profile.load_profile(filepath)
+        return {
+            "filename": request.filename,
+            "dtypes": profile["dtypes"],
+            "columns": profile["report"],
+            "saved_mb": round(profile["saved_bytes"] / 1024 / 1024, 2)
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
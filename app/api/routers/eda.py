@@ -2,7 +2,10 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 import pandas as pd
 import os
-from app.core.ml import eda_utils
+from app.core.ml import eda_utils, eda_report, summary_store, plot_data, sampling
+from app.core.utils import dedup, load_planner
+from app.core.utils.data_io import read_head, apply_dedup
+from app.core.utils.dataset_cache import load_dataset
 from app.core.agents.eda_agent import EDAAgent
 from app.core.utils.logger import SessionLogger
 
@@ -17,52 +20,81 @@ class EDARequest(BaseModel):
     problem_definition: Optional[str] = None
     session_id: str = "default"
     target_col: Optional[str] = None
+    mode: Optional[str] = None # "full" | "streaming" | "sampled"; auto-selected from file size / row count when omitted
+    report_format: str = "xlsx" # "xlsx" | "html" | "parquet"
 
 class EDAResponse(BaseModel):
     stats: dict
     analysis: str
 
+class ColumnsRequest(BaseModel):
+    filename: str
+
+class PlotDataRequest(BaseModel):
+    filename: str
+    column: str
+    treat_as_cat: bool = False
+    bins: int = plot_data.DEFAULT_BINS
+    top_n: int = plot_data.DEFAULT_TOP_N
+
 @router.post("/analyze", response_model=EDAResponse)
 async def analyze_data(request: EDARequest):
     filepath = f"{DATA_DIR}/{request.filename}"
     if not os.path.exists(filepath):
         raise HTTPException(status_code=404, detail="File not found")
     
+    if request.mode not in (None, "full", "streaming", "sampled"):
+        raise HTTPException(status_code=400, detail=f"Unknown mode: {request.mode}")
+    
     try:
-        # Load Data
-        if filepath.endswith('.csv'):
-            df = pd.read_csv(filepath)
+        # 0. Execution mode: sampled above the row threshold, otherwise in memory if it fits the memory budget
+        plan = load_planner.plan_load(filepath, allowed=["in_memory", "chunked"])
+        if request.mode is not None:
+            mode = request.mode
+        elif sampling.should_sample(filepath):
+            mode = "sampled"
         else:
-            df = pd.read_parquet(filepath)
-            
-        # 1. Handle Duplicates (Drop and report)
-        initial_rows = len(df)
-        duplicates_count = df.duplicated().sum()
+            mode = "streaming" if plan["mode"] == "chunked" else "full"
+        plan["mode"] = {"full": "in_memory", "streaming": "chunked", "sampled": "sampled"}[mode]
+        sampled, streaming = mode == "sampled", mode == "streaming"
         
-        if duplicates_count > 0:
-            df.drop_duplicates(inplace=True)
-            # Overwrite file with cleaned data
-            if filepath.endswith('.csv'):
-                df.to_csv(filepath, index=False)
-            else:
-                df.to_parquet(filepath, index=False)
+        # 1. Duplicates: row-hash index applied lazily by every loader (source file is not rewritten)
+        if sampled:
+            # Very large table: approximate statistics from one sampling pass (exact with mode="full"/"streaming").
+            # Duplicates are only known if an index was built earlier; no full hashing pass here.
+            stats = summary_store.get_or_compute_summary(filepath, sampled=True, target_col=request.target_col, duplicates=0)
+            duplicate_rows = dedup.load_duplicate_rows(filepath)
+            n_duplicates = int(len(duplicate_rows)) if duplicate_rows is not None else None
+            dedup_info = {"rows": stats["rows"] + (n_duplicates or 0), "duplicates": n_duplicates}
+            df = read_head(filepath, 20) # Only needed for the report's data sample
+        elif streaming:
+            # Larger-than-memory file: chunked passes only
+            dedup_info = dedup.ensure_dedup_index(filepath)
+            stats = summary_store.get_or_compute_summary(filepath, streaming=True, duplicates=0)
+            df = read_head(filepath, 20) # Only needed for the report's data sample
+        else:
+            # Load Data once and hash it in memory
+            df = load_dataset(filepath, dedup_rows=False)
+            dedup_info = dedup.ensure_dedup_index(filepath, df=df)
+            df = apply_dedup(df, filepath)
             
-        # 2. Statistical Summary (on cleaned data)
-        stats = eda_utils.generate_eda_summary(df)
-        stats["duplicates"] = int(duplicates_count) # Explicitly set original duplicate count
-        stats["rows_original"] = int(initial_rows)
-        stats["rows_cleaned"] = int(len(df))
+            # 2. Statistical Summary (on cleaned data)
+            stats = summary_store.get_or_compute_summary(filepath, df, duplicates=0)
         
-        stats_text = eda_utils.format_summary_for_llm(stats)
+        duplicates_count = dedup_info["duplicates"]
+        stats["duplicates"] = int(duplicates_count) if duplicates_count is not None else None # Explicitly set original duplicate count
+        stats["rows_original"] = int(dedup_info["rows"])
+        stats["rows_cleaned"] = int(dedup_info["rows"] - (duplicates_count or 0))
+        stats["load_plan"] = plan
         
-        # 3. Excel Report
-        history_dir = "app/project_history/reports"
-        os.makedirs(history_dir, exist_ok=True)
-        report_filename = f"eda_report_{request.session_id}_{os.path.basename(request.filename).split('.')[0]}.xlsx"
-        report_path = os.path.join(history_dir, report_filename)
+        stats_text = eda_utils.format_summary_for_llm(stats)
         
-        eda_utils.generate_excel_report(df, stats, report_path)
+        # 3. Report (generated in the background; poll /eda/report/{report_id})
+        report_name = f"eda_report_{request.session_id}_{os.path.basename(request.filename).split('.')[0]}"
+        report = eda_report.submit_report(df.head(20), stats, report_name, request.report_format)
+        report_path = report["report_path"]
         stats["report_path"] = report_path # Log location
+        stats["report_id"] = report["report_id"]
         
         # 4. Agent Analysis
         agent = EDAAgent() # Uses environment variables for URL
@@ -80,3 +112,34 @@ async def analyze_data(request: EDARequest):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/report/{report_id}")
+async def report_status(report_id: str):
+    status = eda_report.get_report_status(report_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return status
+
+@router.post("/columns")
+async def list_columns(request: ColumnsRequest):
+    filepath = f"{DATA_DIR}/{request.filename}"
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        # Served from the stored summary; the data itself is not read when one exists
+        summary = summary_store.get_or_compute_summary(filepath)
+        return {"columns": list(summary["column_types"].keys()), "column_types": summary["column_types"]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/plot-data")
+async def get_plot_data(request: PlotDataRequest):
+    filepath = f"{DATA_DIR}/{request.filename}"
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        return plot_data.get_plot_data(filepath, request.column, request.treat_as_cat, request.bins, request.top_n)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
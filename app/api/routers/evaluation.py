@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
 import pandas as pd
 import os
 from app.api.routers.eda import DATA_DIR
+from app.core.utils import ingest, load_planner
 from app.core.ml.evaluator import Evaluator
+from app.core.ml.feature_pipeline import load_pipeline
 
 router = APIRouter(prefix="/evaluation", tags=["evaluation"])
 
@@ -13,6 +15,24 @@ class EvaluationRequest(BaseModel):
     sensitive_column: str = None
     metric: str = "accuracy"
 
+def _model_columns(model, schema: dict, target: str) -> list:
+    """
+    Columns the model was trained on (all non-target columns if it does not record them) plus the target.
+    """
+    features = getattr(model, "feature_names_in_", None)
+    if features is None:
+        features = [col for col in schema["columns"] if col != target]
+    return [col for col in features if col != target] + [target]
+
+def _restore_dtypes(filepath: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Category columns of a transformed dataset, as the models were trained on them (CSV files lose the dtype).
+    """
+    pipeline = load_pipeline(filepath)
+    if pipeline is None:
+        return df
+    return df.astype({col: dtype for col, dtype in pipeline.categorical_dtypes().items() if col in df.columns})
+
 @router.post("/fairness")
 async def evaluate_fairness(request: EvaluationRequest):
     filepath = f"{DATA_DIR}/{request.filename}"
@@ -20,47 +40,53 @@ async def evaluate_fairness(request: EvaluationRequest):
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        if filepath.endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_parquet(filepath)
-            
         evaluator = Evaluator()
         model = evaluator.load_best_model(metric=request.metric)
         
         if not model:
             raise HTTPException(status_code=404, detail="No trained model found")
             
-        if request.sensitive_column and request.sensitive_column in df.columns:
+        schema = ingest.read_schema(filepath)
+        if request.sensitive_column and request.sensitive_column in schema["columns"]:
             # Simple imputation for fairness check if needed, or assume preprocessed
             pass
         else:
             return {"message": "Sensitive column not found or not provided"}
 
+        # Only the model's features, the target and the sensitive column are read
+        columns = list(dict.fromkeys(_model_columns(model, schema, request.target) + [request.sensitive_column]))
+        # Metrics on a stratified sample if even these columns exceed the memory budget
+        plan = load_planner.plan_load(filepath, columns=columns, allowed=["in_memory", "column_projected", "sampled"])
+        df = load_planner.load_planned(filepath, plan, target_col=request.target) # Duplicate rows excluded via the dedup index
+        df = _restore_dtypes(filepath, df)
+
         fairness_metrics = evaluator.evaluate_fairness(model, df, request.target, request.sensitive_column)
+        fairness_metrics["load_plan"] = plan
         return fairness_metrics
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/explain")
-async def explain_model(request: EvaluationRequest):
+async def explain_model(request: EvaluationRequest, response: Response):
     filepath = f"{DATA_DIR}/{request.filename}"
     if not os.path.exists(filepath):
         raise HTTPException(status_code=404, detail="File not found")
         
     try:
-        if filepath.endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_parquet(filepath)
-            
         evaluator = Evaluator()
         model = evaluator.load_best_model(metric=request.metric)
         if not model:
             raise HTTPException(status_code=404, detail="No trained model found")
             
+        columns = _model_columns(model, ingest.read_schema(filepath), request.target)
+        plan = load_planner.plan_load(filepath, columns=columns, allowed=["in_memory", "column_projected", "sampled"])
+        df = load_planner.load_planned(filepath, plan) # Duplicate rows excluded via the dedup index
+        df = _restore_dtypes(filepath, df)
+            
         explanation = evaluator.generate_explanation(model, df, request.target)
+        # The body is a list of feature importances; the load mode travels in a header
+        response.headers["X-Load-Mode"] = plan["mode"]
         return explanation
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
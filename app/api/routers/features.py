@@ -1,12 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import pandas as pd
 import os
 from app.api.routers.eda import DATA_DIR
-from app.core.ml import eda_utils
+from app.core.utils import load_planner, memory_profile
+from app.core.utils.dataset_cache import load_dataset
+from app.core.ml import eda_utils, summary_store, plan_preview
 from app.core.agents.feature_agent import FeatureEngineeringAgent, TransformationStep
 from app.core.ml.feature_engine import FeatureEngine
+from app.core.ml.feature_pipeline import pipeline_path, load_pipeline
 from app.core.utils.logger import SessionLogger
 
 router = APIRouter(prefix="/features", tags=["features"])
@@ -14,6 +17,7 @@ router = APIRouter(prefix="/features", tags=["features"])
 class FeatureProposalRequest(BaseModel):
     filename: str
     problem_definition: str
+    exact: bool = False # Exact statistics even on tables large enough to be sampled
 
 class FeatureProposalResponse(BaseModel):
     steps: List[TransformationStep]
@@ -23,6 +27,16 @@ class ApplyFeaturesRequest(BaseModel):
     steps: List[TransformationStep]
     session_id: str = "default"
 
+class PreviewFeaturesRequest(BaseModel):
+    filename: str
+    steps: List[TransformationStep]
+    target_col: Optional[str] = None # Stratifies the preview sample
+
+class TransformFeaturesRequest(BaseModel):
+    filename: str # New data (validation / scoring)
+    fitted_filename: str # Transformed dataset whose fitted pipeline is applied
+    session_id: str = "default"
+
 @router.post("/propose", response_model=FeatureProposalResponse)
 async def propose_features(request: FeatureProposalRequest):
     filepath = f"{DATA_DIR}/{request.filename}"
@@ -30,13 +44,8 @@ async def propose_features(request: FeatureProposalRequest):
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        # Load small sample for stats
-        if filepath.endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_parquet(filepath)
-            
-        stats = eda_utils.generate_eda_summary(df)
+        # Reuse the stored summary for this exact dataset content when available
+        stats = summary_store.get_or_compute_summary(filepath, sampled=False if request.exact else None)
         stats_text = eda_utils.format_summary_for_llm(stats)
         
         agent = FeatureEngineeringAgent()
@@ -46,30 +55,53 @@ async def propose_features(request: FeatureProposalRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _output_path(filename: str, chunked: bool) -> tuple:
+    # Chunked runs always write Parquet
+    if chunked:
+        filename = f"{os.path.splitext(filename)[0]}.parquet"
+    new_filename = f"transformed_{filename}"
+    return new_filename, f"{DATA_DIR}/{new_filename}"
+
+def _write(df: pd.DataFrame, filepath: str, new_filepath: str):
+    if filepath.endswith('.csv'):
+        df.to_csv(new_filepath, index=False)
+    else:
+        df.to_parquet(new_filepath, index=False)
+
 @router.post("/apply")
 async def apply_features(request: ApplyFeaturesRequest):
     filepath = f"{DATA_DIR}/{request.filename}"
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    # In memory when the table fits the budget, otherwise out-of-core: one streaming pass per
+    # plan stage fits the parameters, a last one writes the transformed chunks to Parquet
+    plan_info = load_planner.plan_load(filepath, allowed=["in_memory", "chunked"])
+    chunked = plan_info["mode"] == "chunked"
     try:
-        if filepath.endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_parquet(filepath)
-        
         # Apply Logic
         engine = FeatureEngine()
         # Convert steps objects to dicts for the engine
         plan = {"steps": [step.dict() for step in request.steps]}
+        new_filename, new_filepath = _output_path(request.filename, chunked)
+        # Fitted states of an unchanged plan prefix are reused: editing a late step only refits the tail.
+        # The load profile is part of the key since compact dtypes can change the fitted values.
+        profile = "default" if chunked else memory_profile.LOAD_PROFILE
+        dataset_key = f"{summary_store.summary_key(filepath)}:{profile}"
         
-        transformed_df = engine.apply_plan(df, plan)
-        
-        # Save new file
-        new_filename = f"transformed_{request.filename}"
-        new_filepath = f"{DATA_DIR}/{new_filename}"
-        
-        if filepath.endswith('.csv'):
-            transformed_df.to_csv(new_filepath, index=False)
+        if chunked:
+            pipeline, result = engine.apply_plan_to_file(filepath, plan, new_filepath, plan_info["chunk_rows"],
+                                                         dataset_key=dataset_key)
+            columns = result["columns"]
         else:
-            transformed_df.to_parquet(new_filepath, index=False)
+            df = load_dataset(filepath) # Shared cache; duplicate rows excluded via the dedup index
+            pipeline, transformed_df = engine.fit_plan(df, plan, dataset_key=dataset_key)
+            _write(transformed_df, filepath, new_filepath)
+            columns = transformed_df.columns.tolist()
+            # Summary for the new file: only changed/new columns are recomputed
+            summary_store.derive_summary(filepath, transformed_df, new_filepath)
+        # Fitted parameters, to transform validation / scoring data the same way
+        pipeline.save(pipeline_path(new_filepath))
             
         # Log to Session
         logger = SessionLogger(session_id=request.session_id)
@@ -79,7 +111,62 @@ async def apply_features(request: ApplyFeaturesRequest):
             "message": "Features applied successfully",
             "new_filename": new_filename,
             "new_filepath": new_filepath,
-            "columns": transformed_df.columns.tolist()
+            "columns": columns,
+            "pipeline": pipeline_path(new_filepath),
+            "reused_steps": engine.reused_steps,
+            "load_plan": plan_info
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/preview")
+async def preview_features(request: PreviewFeaturesRequest):
+    """
+    Runs the plan on a cached sample of the dataset and reports what /features/apply would produce.
+    Nothing is written; meant to be called on every edit of the plan.
+    """
+    filepath = f"{DATA_DIR}/{request.filename}"
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        plan = {"steps": [step.dict() for step in request.steps]}
+        return plan_preview.preview_plan(filepath, plan, target_col=request.target_col)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/transform")
+async def transform_features(request: TransformFeaturesRequest):
+    """
+    Applies the pipeline fitted by /features/apply to new data, without refitting any statistic.
+    """
+    filepath = f"{DATA_DIR}/{request.filename}"
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="File not found")
+    pipeline = load_pipeline(f"{DATA_DIR}/{request.fitted_filename}")
+    if pipeline is None:
+        raise HTTPException(status_code=404, detail="No fitted pipeline for this dataset")
+
+    plan_info = load_planner.plan_load(filepath, allowed=["in_memory", "chunked"])
+    chunked = plan_info["mode"] == "chunked"
+    try:
+        new_filename, new_filepath = _output_path(request.filename, chunked)
+        if chunked:
+            columns = pipeline.transform_file(filepath, new_filepath, plan_info["chunk_rows"])["columns"]
+        else:
+            transformed_df = pipeline.transform(load_dataset(filepath))
+            _write(transformed_df, filepath, new_filepath)
+            columns = transformed_df.columns.tolist()
+        pipeline.save(pipeline_path(new_filepath))
+
+        logger = SessionLogger(session_id=request.session_id)
+        logger.log_step("Feature Engineering", f"Applied the pipeline of {request.fitted_filename} to {request.filename}")
+
+        return {
+            "message": "Fitted pipeline applied successfully",
+            "new_filename": new_filename,
+            "new_filepath": new_filepath,
+            "columns": columns,
+            "load_plan": plan_info
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -4,15 +4,17 @@ from typing import List
 import pandas as pd
 import os
 from app.api.routers.eda import DATA_DIR
-from app.core.ml import eda_utils
+from app.core.ml import eda_utils, summary_store
 from app.core.agents.modeling_agent import ModelingAgent, ModelingPlan
-from app.core.flows.training_flow import run_training_flow
+from app.core.flows.training_flow import run_training_flow, TRAINING_LOAD_MODES
+from app.core.utils import load_planner
 
 router = APIRouter(prefix="/training", tags=["training"])
 
 class TrainingProposeRequest(BaseModel):
     filename: str
     problem_definition: str
+    exact: bool = False # Exact statistics even on tables large enough to be sampled
 
 class TrainingLaunchRequest(BaseModel):
     filename: str
@@ -29,13 +31,8 @@ async def propose_model(request: TrainingProposeRequest):
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        # Load stats
-        if filepath.endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_parquet(filepath)
-        
-        stats = eda_utils.generate_eda_summary(df)
+        # Load stats (reused from /eda/analyze or /features/apply when the data is unchanged)
+        stats = summary_store.get_or_compute_summary(filepath, sampled=False if request.exact else None)
         stats_text = eda_utils.format_summary_for_llm(stats)
         
         agent = ModelingAgent()
@@ -47,6 +44,12 @@ async def propose_model(request: TrainingProposeRequest):
 
 @router.post("/train")
 async def start_training(request: TrainingLaunchRequest, background_tasks: BackgroundTasks):
+    filepath = f"{DATA_DIR}/{request.filename}"
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="File not found")
+    # Same plan the flow's load step will follow
+    plan = load_planner.plan_load(filepath, allowed=TRAINING_LOAD_MODES)
+    
     # Launch Prefect Flow in Background
     background_tasks.add_task(
         run_training_flow, 
@@ -58,4 +61,5 @@ async def start_training(request: TrainingLaunchRequest, background_tasks: Backg
         session_id=request.session_id
     )
     
-    return {"message": "Training started in background", "tracking_url": os.getenv("PREFECT_UI_URL", "http://localhost:4200")}
+    return {"message": "Training started in background", "tracking_url": os.getenv("PREFECT_UI_URL", "http://localhost:4200"),
+            "load_plan": plan}
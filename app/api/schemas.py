@@ -11,4 +11,5 @@ class DataUploadResponse(BaseModel):
     filename: str
     filepath: str
     columns: List[str]
+    rows: Optional[int] = None
     message: str
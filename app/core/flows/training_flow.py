@@ -2,20 +2,27 @@ from prefect import flow, task
 from app.core.ml.trainer import ModelTrainer
 import pandas as pd
 from app.api.routers.eda import DATA_DIR
+from app.core.utils import load_planner
+from app.core.ml.feature_pipeline import load_pipeline
+from app.core.ml import summary_store
 from app.core.utils.logger import SessionLogger
 
+TRAINING_LOAD_MODES = ["in_memory", "sampled"]
+
 @task(name="Load Data")
-def load_data(filename: str):
+def load_data(filename: str, target: str = None):
     filepath = f"{DATA_DIR}/{filename}"
-    if filepath.endswith('.csv'):
-        return pd.read_csv(filepath)
-    else:
-        return pd.read_parquet(filepath)
+    # Whole table if it fits the memory budget, otherwise a (target-stratified) sample as large as the budget allows
+    plan = load_planner.plan_load(filepath, allowed=TRAINING_LOAD_MODES)
+    df = load_planner.load_planned(filepath, plan, target_col=target) # Duplicate rows excluded via the dedup index
+    return df, plan
 
 @task(name="Run Optuna Optimization")
-def run_optimization(df: pd.DataFrame, target: str, problem_type: str, configs: list, metric: str):
+def run_optimization(df: pd.DataFrame, target: str, problem_type: str, configs: list, metric: str, feature_pipeline: dict = None,
+                     dataset_key: str = None):
     trainer = ModelTrainer()
-    result = trainer.run_optuna_study(df, target, problem_type, configs, metric)
+    result = trainer.run_optuna_study(df, target, problem_type, configs, metric, feature_pipeline=feature_pipeline,
+                                      dataset_key=dataset_key)
     return result
 
 @flow(name="Model Training Flow")
@@ -24,8 +31,17 @@ def run_training_flow(filename: str, target: str, problem_type: str, configs: li
     logger.log_step("Model Training", f"Started training flow for {filename} with models: {[c['model_type'] for c in configs]}")
     
     try:
-        df = load_data(filename)
-        result = run_optimization(df, target, problem_type, configs, metric)
+        df, plan = load_data(filename, target)
+        logger.log_step("Data Loaded", f"Load mode: {plan['mode']} ({len(df)} rows, ~{plan['estimated_mb']} MB estimated for the full table, budget {plan['budget_mb']} MB)")
+        # Fitted feature pipeline of a transformed dataset, logged with the models trained on it
+        pipeline = load_pipeline(f"{DATA_DIR}/{filename}")
+        if pipeline is not None:
+            # High-cardinality columns kept as categories (CSV files lose the dtype)
+            df = df.astype(pipeline.categorical_dtypes())
+        # Studies are resumed for the same data: file content plus how much of it was loaded
+        dataset_key = f"{summary_store.summary_key(f'{DATA_DIR}/{filename}')}:{plan['mode']}:{len(df)}"
+        result = run_optimization(df, target, problem_type, configs, metric,
+                                  feature_pipeline=pipeline.to_dict() if pipeline else None, dataset_key=dataset_key)
         logger.log_step("Model Training Completed", f"Result: {result}")
         return result
     except Exception as e:
@@ -0,0 +1,142 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Blocked correlation engine for wide numeric tables.
+# Columns are standardized once and the correlation matrix is computed block by block,
+# keeping only the strongest pairs; the full p x p matrix is materialized on request only.
+
+CORR_THRESHOLD = float(os.getenv("EDA_CORR_THRESHOLD", "0.7"))
+CORR_TOP_K = int(os.getenv("EDA_CORR_TOP_K", "100"))
+CORR_BLOCK_SIZE = int(os.getenv("EDA_CORR_BLOCK_SIZE", "512"))
+
+
+def _block_corr(xi, mi, xj, mj, has_missing: bool, n_rows: int) -> np.ndarray:
+    if not has_missing:
+        # Standardized, complete data: one matrix product per block
+        return (xi.T @ xj) / (n_rows - 1)
+    # Pairwise-complete (DataFrame.corr semantics) from masked co-moment sums
+    n = mi.T @ mj
+    sx = xi.T @ mj
+    sy = mi.T @ xj
+    sxx = (xi * xi).T @ mj
+    syy = mi.T @ (xj * xj)
+    sxy = xi.T @ xj
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+    r[n < 2] = np.nan
+    return r
+
+
+def _prepare(numeric_df: pd.DataFrame, dtype):
+    values = numeric_df.to_numpy(dtype=np.float64)
+    mask = ~np.isnan(values)
+    has_missing = not mask.all()
+    with np.errstate(invalid="ignore"):
+        mean = np.nanmean(values, axis=0) if len(values) else np.zeros(values.shape[1])
+        std = np.nanstd(values, axis=0, ddof=1) if len(values) > 1 else np.zeros(values.shape[1])
+    std = np.where(np.isfinite(std) & (std > 0), std, np.nan)
+    if has_missing:
+        # Centered (scale does not matter for the masked formula), zero where missing
+        z = np.where(mask, values - np.nan_to_num(mean), 0.0).astype(dtype)
+    else:
+        z = ((values - mean) / std).astype(dtype) # constant columns become NaN -> NaN correlations
+    return z, mask.astype(dtype), has_missing
+
+
+def correlation_pairs(numeric_df: pd.DataFrame, threshold: float = CORR_THRESHOLD, top_k: int = CORR_TOP_K,
+                      columns: list = None, block_size: int = CORR_BLOCK_SIZE, return_matrix: bool = False) -> dict:
+    """
+    Computes Pearson correlations in column blocks and keeps only pairs with |r| > threshold,
+    capped at the `top_k` strongest (either limit may be None).
+    `columns` restricts the search to pairs involving at least one of these columns.
+    Returns {"pairs": [(col1, col2, r), ...] sorted by |r| descending} and, only when
+    return_matrix=True, "matrix": the full correlation DataFrame (computed in float64).
+    """
+    cols = numeric_df.columns.tolist()
+    p = len(cols)
+    dtype = np.float64 if return_matrix else np.float32
+    z, m, has_missing = _prepare(numeric_df, dtype)
+    n_rows = len(numeric_df)
+
+    left = list(range(p)) if columns is None else [cols.index(c) for c in columns if c in cols]
+    in_left = np.zeros(p, dtype=bool)
+    in_left[left] = True
+    matrix = np.full((p, p), np.nan) if return_matrix else None
+
+    found_i, found_j, found_r = [], [], []
+    kept = 0
+    for lo in range(0, len(left), block_size):
+        li = np.array(left[lo:lo + block_size])
+        # Full search only needs the upper triangle
+        start = li.min() if columns is None else 0
+        for rlo in range(start, p, block_size):
+            rj = np.arange(rlo, min(rlo + block_size, p))
+            r = _block_corr(z[:, li], m[:, li], z[:, rj], m[:, rj], has_missing, n_rows)
+            r = np.clip(r, -1.0, 1.0)
+            if matrix is not None:
+                matrix[np.ix_(li, rj)] = r
+                matrix[np.ix_(rj, li)] = r.T
+
+            gi, gj = np.meshgrid(li, rj, indexing="ij")
+            # Each unordered pair once: i < j, unless j is outside the searched columns
+            valid = (gi != gj) & ((gi < gj) | ~in_left[gj])
+            select = valid & ~np.isnan(r)
+            if threshold is not None:
+                select &= np.abs(r) > threshold
+            if not select.any():
+                continue
+            found_i.append(gi[select])
+            found_j.append(gj[select])
+            found_r.append(r[select].astype(np.float64))
+            kept += int(select.sum())
+
+            # Bound memory: trim candidates to the top_k strongest so far
+            if top_k is not None and kept > 2 * top_k:
+                found_i, found_j, found_r = _trim(found_i, found_j, found_r, top_k)
+                kept = len(found_r[0])
+
+    if found_r:
+        found_i, found_j, found_r = _trim(found_i, found_j, found_r, top_k)
+        order = np.argsort(-np.abs(found_r[0]), kind="mergesort")
+        pairs = [(cols[min(found_i[0][k], found_j[0][k])], cols[max(found_i[0][k], found_j[0][k])], float(found_r[0][k]))
+                 for k in order]
+    else:
+        pairs = []
+
+    result = {"pairs": pairs}
+    if matrix is not None:
+        np.fill_diagonal(matrix, np.where(np.isnan(np.diag(matrix)), np.nan, 1.0))
+        result["matrix"] = pd.DataFrame(matrix, index=cols, columns=cols)
+    return result
+
+
+def _trim(found_i, found_j, found_r, top_k):
+    fi, fj, fr = np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_r)
+    if top_k is not None and len(fr) > top_k:
+        keep = np.argpartition(-np.abs(fr), top_k - 1)[:top_k]
+        fi, fj, fr = fi[keep], fj[keep], fr[keep]
+    return [fi], [fj], [fr]
+
+
+def pairs_from_matrix(corr: pd.DataFrame, threshold: float = CORR_THRESHOLD, top_k: int = CORR_TOP_K) -> list:
+    """
+    Extracts the strongest pairs from an already computed correlation matrix.
+    """
+    values = corr.to_numpy()
+    i, j = np.triu_indices(len(values), k=1)
+    r = values[i, j]
+    select = ~np.isnan(r)
+    if threshold is not None:
+        select &= np.abs(r) > threshold
+    i, j, r = i[select], j[select], r[select]
+    order = np.argsort(-np.abs(r), kind="mergesort")[:top_k]
+    cols = corr.columns.tolist()
+    return [(cols[i[k]], cols[j[k]], float(r[k])) for k in order]
+
+
+def pairs_to_dict(pairs: list) -> dict:
+    """
+    Compact, JSON friendly form stored in the summary as "high_correlations".
+    """
+    return {f"{col1} - {col2}": round(r, 4) for col1, col2, r in pairs}
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.model_selection import StratifiedKFold, KFold
+
+# Cross-validation data shared by all the trials of a study.
+# Fold indices are computed once; every fold's train / test rows are materialized once
+# as contiguous float32 matrices (frames with category columns stay frames, sparse
+# designs stay CSR), and the native training matrices of the boosting libraries
+# (xgboost QuantileDMatrix, lightgbm Dataset) are built on first use and reused, so
+# binning / quantization happens once per fold instead of once per trial and fold.
+# The boosters' bin boundaries are frozen with the matrices: trials that change them
+# (max_bin and other dataset parameters) train from the fold matrices instead.
+
+XGB_MAX_BIN = 256
+LGB_MAX_BIN = 255
+
+
+def _take(data, idx: np.ndarray):
+    return data.iloc[idx] if isinstance(data, (pd.DataFrame, pd.Series)) else data[idx]
+
+
+def _fold_matrix(X, idx: np.ndarray):
+    rows = _take(X, idx)
+    if sp.issparse(rows):
+        return rows.astype(np.float32)
+    if isinstance(rows, pd.DataFrame) and len(rows.select_dtypes(include=["category"]).columns):
+        return rows # Native categoricals
+    return np.ascontiguousarray(np.asarray(rows, dtype=np.float32))
+
+
+class CVData:
+    """
+    Folds of (X, y) for a study. `codes` are the class codes 0..k-1 of a classification target
+    (the labels the native boosters train on), otherwise y as float.
+    """
+    def __init__(self, X, y: pd.Series, n_splits: int, is_classification: bool):
+        self.X, self.y = X, y
+        self.n_splits = n_splits
+        self.is_classification = is_classification
+        cv = StratifiedKFold(n_splits=n_splits) if is_classification else KFold(n_splits=n_splits)
+        self.folds = list(cv.split(X, y))
+        if is_classification:
+            self.classes, codes = np.unique(np.asarray(y), return_inverse=True)
+            self.codes = codes.astype(np.int32)
+        else:
+            self.classes, self.codes = None, np.asarray(y, dtype=np.float64)
+        self._matrices = {}
+        self._native = {}
+
+    def fold(self, k: int) -> tuple:
+        """
+        (X_train, y_train, X_test, y_test) of fold k; X as fold matrices, y with the original labels.
+        """
+        if k not in self._matrices:
+            train_idx, test_idx = self.folds[k]
+            self._matrices[k] = (_fold_matrix(self.X, train_idx), np.asarray(_take(self.y, train_idx)),
+                                 _fold_matrix(self.X, test_idx), np.asarray(_take(self.y, test_idx)))
+        return self._matrices[k]
+
+    def fold_codes(self, k: int) -> tuple:
+        train_idx, test_idx = self.folds[k]
+        return self.codes[train_idx], self.codes[test_idx]
+
+    def xgb_fold(self, k: int, enable_categorical: bool) -> tuple:
+        """
+        (train, test) QuantileDMatrix of fold k; the test matrix uses the train matrix's quantiles.
+        """
+        key = ("xgb", k)
+        if key not in self._native:
+            import xgboost as xgb
+            X_train, _, X_test, _ = self.fold(k)
+            y_train, y_test = self.fold_codes(k)
+            train = xgb.QuantileDMatrix(X_train, y_train, max_bin=XGB_MAX_BIN, enable_categorical=enable_categorical)
+            test = xgb.QuantileDMatrix(X_test, y_test, ref=train, max_bin=XGB_MAX_BIN, enable_categorical=enable_categorical)
+            self._native[key] = (train, test)
+        return self._native[key]
+
+    def lgb_fold(self, k: int) -> tuple:
+        """
+        (train, valid) lightgbm Datasets of fold k; the validation set uses the train set's bins.
+        """
+        key = ("lgb", k)
+        if key not in self._native:
+            import lightgbm as lgb
+            X_train, _, X_test, _ = self.fold(k)
+            y_train, y_test = self.fold_codes(k)
+            # feature_pre_filter=False: trials may lower min_child_samples on the same Dataset
+            params = {"max_bin": LGB_MAX_BIN, "feature_pre_filter": False, "verbosity": -1}
+            train = lgb.Dataset(X_train, y_train, params=params, free_raw_data=False).construct()
+            valid = lgb.Dataset(X_test, y_test, reference=train, params=params, free_raw_data=False).construct()
+            self._native[key] = (train, valid)
+        return self._native[key]
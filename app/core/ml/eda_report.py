@@ -0,0 +1,180 @@
+import html
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# EDA report generation as background jobs.
+# Every report is produced from the same row generators, so writers never build
+# whole-table DataFrames: xlsx uses openpyxl's write-only (streaming) mode,
+# html is written table by table, and parquet writes one small file per table.
+
+REPORT_DIR = "app/project_history/reports"
+JOBS_DIR = os.path.join(REPORT_DIR, "jobs")
+REPORT_FORMATS = ["xlsx", "html", "parquet"]
+REPORT_WORKERS = int(os.getenv("EDA_REPORT_WORKERS", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="eda_report")
+
+
+def _cell(value):
+    # Plain python values only; NaN/inf become empty cells
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def report_tables(sample: pd.DataFrame, summary: dict):
+    """
+    Yields (name, header, rows) for every report table; rows is a lazy iterator of lists.
+    """
+    yield "Overview", ["Metric", "Value"], iter([
+        ["Rows", summary["rows"]],
+        ["Columns", summary["columns"]],
+        ["Duplicates (Checked)", summary["duplicates"]],
+        ["Missing Values Total", sum(summary["missing_values"].values())]
+    ])
+    yield "Column Types", ["Column", "Type"], ([col, t] for col, t in summary["column_types"].items())
+    yield "Missing Values", ["Column", "Missing Count"], ([col, n] for col, n in summary["missing_values"].items())
+
+    # One row per column (a column per stat would overflow Excel's column limit on wide tables)
+    numerical = summary.get("numerical_stats") or {}
+    if numerical:
+        stat_names = list(next(iter(numerical.values())).keys())
+        yield "Numerical Stats", ["Column"] + stat_names, \
+            ([col] + [stats.get(name) for name in stat_names] for col, stats in numerical.items())
+
+    categorical = summary.get("categorical_stats") or {}
+    if categorical:
+        stat_names = ["unique", "missing", "top", "freq"]
+        yield "Categorical Stats", ["Column"] + stat_names, \
+            ([col] + [stats.get(name) for name in stat_names] for col, stats in categorical.items())
+
+    if "correlations" in summary:
+        cols = list(summary["correlations"].keys())
+        yield "Correlation Matrix", [""] + cols, \
+            ([row] + [summary["correlations"][col].get(row) for col in cols] for row in cols)
+    elif summary.get("high_correlations"):
+        yield "High Correlations", ["Pair", "Correlation"], \
+            ([pair, r] for pair, r in summary["high_correlations"].items())
+
+    sample = sample.head(20)
+    yield "Data Sample (First 20)", [str(col) for col in sample.columns], \
+        (list(row) for row in sample.itertuples(index=False, name=None))
+
+
+def write_excel(sample: pd.DataFrame, summary: dict, output_path: str):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    for name, header, rows in report_tables(sample, summary):
+        sheet = workbook.create_sheet(title=name[:31]) # Excel sheet name limit
+        sheet.append(header)
+        for row in rows:
+            sheet.append([_cell(v) for v in row])
+    workbook.save(output_path)
+
+
+def write_html(sample: pd.DataFrame, summary: dict, output_path: str):
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("<!DOCTYPE html><html><head><meta charset='utf-8'><title>EDA Report</title></head><body>\n")
+        f.write("<h1>EDA Report</h1>\n")
+        for name, header, rows in report_tables(sample, summary):
+            f.write(f"<h2>{html.escape(name)}</h2>\n<table border='1'>\n<tr>")
+            f.write("".join(f"<th>{html.escape(str(h))}</th>" for h in header))
+            f.write("</tr>\n")
+            for row in rows:
+                cells = ("" if v is None else html.escape(str(v)) for v in map(_cell, row))
+                f.write("<tr>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>\n")
+            f.write("</table>\n")
+        f.write("</body></html>\n")
+
+
+def write_parquet(sample: pd.DataFrame, summary: dict, output_path: str):
+    """
+    Writes a directory with one Parquet file per report table.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    os.makedirs(output_path, exist_ok=True)
+    for name, header, rows in report_tables(sample, summary):
+        columns = list(zip(*[[_cell(v) for v in row] for row in rows])) or [[] for _ in header]
+        # Mixed-type columns (e.g. the Overview values or the data sample) are stored as text
+        arrays = []
+        for values in columns:
+            try:
+                arrays.append(pa.array(values))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                arrays.append(pa.array([None if v is None else str(v) for v in values]))
+        names = [h or "column" for h in header]
+        filename = name.lower().replace(" ", "_").replace("(", "").replace(")", "")
+        pq.write_table(pa.Table.from_arrays(arrays, names=names), os.path.join(output_path, f"{filename}.parquet"))
+
+
+WRITERS = {"xlsx": write_excel, "html": write_html, "parquet": write_parquet}
+
+
+def _job_path(report_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{report_id}.json")
+
+
+def _set_status(report_id: str, **fields):
+    status = get_report_status(report_id) or {"report_id": report_id}
+    status.update(fields, updated_at=datetime.now().isoformat())
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    tmp_path = f"{_job_path(report_id)}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, _job_path(report_id))
+
+
+def get_report_status(report_id: str) -> dict:
+    """
+    Returns {"report_id", "status": pending|running|done|failed, "format", "report_path", "error"} or None.
+    """
+    path = _job_path(report_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _run_job(report_id: str, sample: pd.DataFrame, summary: dict, report_path: str, report_format: str):
+    _set_status(report_id, status="running")
+    # Write next to the final path and rename, so a polled report_path is always complete
+    tmp_path = f"{report_path}.partial"
+    try:
+        WRITERS[report_format](sample, summary, tmp_path)
+        if os.path.isdir(report_path):
+            shutil.rmtree(report_path)
+        os.replace(tmp_path, report_path)
+        _set_status(report_id, status="done")
+    except Exception as e:
+        print(f"Error generating {report_format} report: {e}")
+        _set_status(report_id, status="failed", error=str(e))
+
+
+def submit_report(sample: pd.DataFrame, summary: dict, report_name: str, report_format: str = "xlsx") -> dict:
+    """
+    Queues report generation in the background and returns its status handle immediately.
+    `sample` only needs the first rows of the dataset.
+    """
+    if report_format not in WRITERS:
+        raise ValueError(f"Unknown report format: {report_format}. Use one of {REPORT_FORMATS}")
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    report_id = uuid.uuid4().hex[:12]
+    extension = "" if report_format == "parquet" else f".{report_format}"
+    # One file per job: concurrent reports of the same dataset never share a path
+    report_path = os.path.join(REPORT_DIR, f"{report_name}_{report_id}{extension}")
+    _set_status(report_id, status="pending", format=report_format, report_path=report_path, error=None)
+    # Snapshot the inputs: the caller keeps mutating its stats dict after we return
+    _executor.submit(_run_job, report_id, sample.head(20).copy(), json.loads(json.dumps(summary, default=str)),
+                     report_path, report_format)
+    return get_report_status(report_id)
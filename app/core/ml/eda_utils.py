@@ -1,49 +1,212 @@
 import pandas as pd
 import numpy as np
 import io
+import os
+from app.core.ml import parallel_stats, correlation, eda_report
+from app.core.ml.sketches import Moments, QuantileSketch, HyperLogLog, HeavyHitters, CoMoments, hash_values
+from app.core.utils.data_io import iter_chunks, DEFAULT_CHUNK_ROWS
+from app.core.utils.dedup import RowHashSet, row_hashes
+from app.core.utils import load_planner
 
-def generate_eda_summary(df: pd.DataFrame) -> dict:
+# Wide frames get their per-column stats computed across a process pool
+PARALLEL_MIN_COLUMNS = int(os.getenv("EDA_PARALLEL_MIN_COLUMNS", "200"))
+PARALLEL_N_JOBS = int(os.getenv("EDA_N_JOBS", str(os.cpu_count() or 1)))
+# Above this many numeric columns only the strongest correlation pairs are kept
+FULL_CORR_MAX_COLUMNS = int(os.getenv("EDA_FULL_CORR_MAX_COLUMNS", "50"))
+
+def _categorical_column_stats(series: pd.Series) -> dict:
+    mode = series.mode()
+    return {
+        "unique": int(series.nunique()),
+        "missing": int(series.isnull().sum()),
+        "top": str(mode.iloc[0]) if not mode.empty else "N/A",
+        "freq": int(series.value_counts().iloc[0]) if not series.empty else 0
+    }
+
+def generate_eda_summary(df: pd.DataFrame, n_jobs: int = None, duplicates: int = None, full_correlations: bool = None) -> dict:
     """
     Generates a statistical summary of the dataframe for the LLM.
+    n_jobs > 1 computes the per-column stats across a process pool; when omitted,
+    the pool is used automatically for frames with at least EDA_PARALLEL_MIN_COLUMNS columns.
+    A known duplicate count (e.g. 0 for an already deduplicated frame) skips the duplicate scan.
+    Strong correlation pairs are always reported as "high_correlations"; the full matrix
+    ("correlations") only when full_correlations=True, or by default for narrow tables.
     """
+    if n_jobs is None:
+        n_jobs = PARALLEL_N_JOBS if len(df.columns) >= PARALLEL_MIN_COLUMNS else 1
+    
+    cat_cols = df.select_dtypes(include=['object', 'category', 'bool', 'string']).columns
+    num_cols = df.select_dtypes(include=[np.number]).columns
+    
     summary = {
         "rows": int(len(df)),
         "columns": int(len(df.columns)),
         "column_types": df.dtypes.astype(str).to_dict(),
         "missing_values": df.isnull().sum().to_dict(), # Series to dict int64 -> int
-        "duplicates": int(df.duplicated().sum()),
-        "numerical_stats": df.describe().to_dict(),
+        "duplicates": int(duplicates) if duplicates is not None else int(df.duplicated().sum()),
         "categorical_stats": {}
     }
     
-    # Categorical Stats
-    cat_cols = df.select_dtypes(include=['object', 'category', 'bool']).columns
-    for col in cat_cols:
-        summary["categorical_stats"][col] = {
-            "unique": int(df[col].nunique()),
-            "missing": int(df[col].isnull().sum()),
-            "top": str(df[col].mode().iloc[0]) if not df[col].mode().empty else "N/A",
-            "freq": int(df[col].value_counts().iloc[0]) if not df[col].empty else 0
-        }
+    # Any wide table goes to the pool, categorical-only ones included
+    if n_jobs > 1 and len(num_cols) + len(cat_cols) > 0:
+        numerical_stats, categorical_stats, fallback_cols = parallel_stats.compute_column_stats_parallel(
+            df, num_cols.tolist(), cat_cols.tolist(), n_jobs
+        )
+        # Columns Arrow could not share (e.g. mixed-type objects) are done in-process
+        num_fallback = [col for col in num_cols if col in fallback_cols]
+        if num_fallback:
+            numerical_stats.update(df[num_fallback].describe().to_dict())
+        for col in cat_cols:
+            if col in fallback_cols:
+                categorical_stats[col] = _categorical_column_stats(df[col])
+        summary["numerical_stats"] = {col: numerical_stats[col] for col in num_cols}
+        summary["categorical_stats"] = {col: categorical_stats[col] for col in cat_cols}
+    else:
+        summary["numerical_stats"] = df.describe().to_dict()
+        
+        # Categorical Stats
+        for col in cat_cols:
+            summary["categorical_stats"][col] = _categorical_column_stats(df[col])
 
     # Convert numpy types to native python types for serialization
     for key, value in summary["missing_values"].items():
         summary["missing_values"][key] = int(value)
         
-    # Correlations (Full Matrix for numeric)
-    numeric_df = df.select_dtypes(include=[np.number])
-    if not numeric_df.empty and len(numeric_df.columns) > 1:
-        corr_matrix = numeric_df.corr().round(4)
-        # Convert to dict of dicts for JSON serialization
-        summary["correlations"] = corr_matrix.to_dict()
+    # Correlations: strongest pairs from the blocked engine, full matrix only for narrow tables
+    if len(num_cols) > 1:
+        if full_correlations is None:
+            full_correlations = len(num_cols) <= FULL_CORR_MAX_COLUMNS
+        result = correlation.correlation_pairs(df[num_cols], return_matrix=full_correlations)
+        summary["high_correlations"] = correlation.pairs_to_dict(result["pairs"])
+        if full_correlations:
+            # Convert to dict of dicts for JSON serialization
+            summary["correlations"] = result["matrix"].round(4).to_dict()
         
     return summary
 
+def should_stream(filepath: str) -> bool:
+    """
+    Decides whether a file is too large for the memory budget and needs the streaming summary engine.
+    """
+    return load_planner.plan_load(filepath, allowed=["in_memory", "chunked"])["mode"] == "chunked"
+
+def _merge_dtype(prev: np.dtype, cur: np.dtype) -> np.dtype:
+    # Mirrors how a full read would type a column whose chunks disagree (e.g. int64 + NaN -> float64)
+    if prev == cur:
+        return prev
+    if pd.api.types.is_numeric_dtype(prev) and pd.api.types.is_numeric_dtype(cur) \
+            and not pd.api.types.is_bool_dtype(prev) and not pd.api.types.is_bool_dtype(cur):
+        return np.promote_types(prev, cur)
+    return np.dtype(object)
+
+def generate_eda_summary_streaming(filepath: str, chunksize: int = DEFAULT_CHUNK_ROWS, duplicates: int = None) -> dict:
+    """
+    Single-pass, chunked equivalent of generate_eda_summary for files that do not fit in memory.
+    Produces the same summary dict shape; quantiles, unique counts and top values are approximate
+    once a column exceeds the sketch sizes. The column schema is fixed by the first chunk.
+    Rows excluded by the file's dedup index are skipped; a known duplicate count skips the hash scan.
+    """
+    rows = 0
+    columns = None
+    column_types = {}
+    missing = None
+    seen_rows = RowHashSet() if duplicates is None else None
+    duplicates = duplicates or 0
+
+    for chunk in iter_chunks(filepath, chunksize=chunksize):
+        if columns is None:
+            columns = chunk.columns.tolist()
+            num_cols = chunk.select_dtypes(include=[np.number]).columns.tolist()
+            cat_cols = chunk.select_dtypes(include=['object', 'category', 'bool', 'string']).columns.tolist()
+            missing = pd.Series(0, index=columns, dtype=np.int64)
+            moments = Moments(len(num_cols))
+            quantiles = {col: QuantileSketch() for col in num_cols}
+            distinct = {col: HyperLogLog() for col in cat_cols}
+            top_values = {col: HeavyHitters() for col in cat_cols}
+            comoments = CoMoments(len(num_cols)) if len(num_cols) > 1 else None
+
+        rows += len(chunk)
+        for col, dtype in chunk.dtypes.items():
+            column_types[col] = _merge_dtype(column_types[col], dtype) if col in column_types else dtype
+        missing += chunk.isnull().sum()
+
+        # Duplicates: 64-bit row hashes, checked against all previous chunks
+        if seen_rows is not None:
+            duplicates += int(seen_rows.add(row_hashes(chunk)).sum())
+
+        if num_cols:
+            numeric = chunk[num_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+            moments.update(numeric)
+            for i, col in enumerate(num_cols):
+                quantiles[col].update(numeric[:, i])
+            if comoments is not None:
+                comoments.update(numeric)
+
+        for col in cat_cols:
+            distinct[col].update(hash_values(chunk[col]))
+            top_values[col].update(chunk[col])
+
+    if seen_rows is not None:
+        seen_rows.close()
+
+    if columns is None:
+        # Empty file: nothing to summarize
+        columns, num_cols, cat_cols, comoments = [], [], [], None
+
+    summary = {
+        "rows": int(rows),
+        "columns": int(len(columns)),
+        "column_types": {col: str(column_types[col]) for col in columns},
+        "missing_values": {col: int(missing[col]) for col in columns},
+        "duplicates": int(duplicates),
+        "numerical_stats": {},
+        "categorical_stats": {},
+        "summary_mode": "streaming"
+    }
+
+    stds = moments.std() if num_cols else []
+    for i, col in enumerate(num_cols):
+        count = moments.n[i]
+        q25, q50, q75 = quantiles[col].quantiles([0.25, 0.5, 0.75])
+        summary["numerical_stats"][col] = {
+            "count": float(count),
+            "mean": float(moments.mean[i]) if count else np.nan,
+            "std": float(stds[i]),
+            "min": float(moments.min[i]) if count else np.nan,
+            "25%": q25,
+            "50%": q50,
+            "75%": q75,
+            "max": float(moments.max[i]) if count else np.nan
+        }
+
+    for col in cat_cols:
+        top, freq = top_values[col].top()
+        summary["categorical_stats"][col] = {
+            "unique": distinct[col].count(),
+            "missing": int(missing[col]),
+            "top": str(top) if top is not None else "N/A",
+            "freq": int(freq)
+        }
+
+    if comoments is not None:
+        corr_matrix = pd.DataFrame(comoments.corr(), index=num_cols, columns=num_cols)
+        summary["high_correlations"] = correlation.pairs_to_dict(correlation.pairs_from_matrix(corr_matrix))
+        if len(num_cols) <= FULL_CORR_MAX_COLUMNS:
+            summary["correlations"] = corr_matrix.round(4).to_dict()
+
+    return summary
+
 def format_summary_for_llm(summary: dict) -> str:
     """
     Converts the summary dict to a readable string for the prompt.
     """
     text = f"Dataset Shape: {summary['rows']} rows, {summary['columns']} columns.\n\n"
+    if summary.get("summary_mode") == "sampled":
+        sample = summary["sampling"]
+        text += (f"Note: statistics estimated from a random sample of {sample['sample_rows']} rows "
+                 f"({sample['fraction']:.2%}, {sample['method']}); proportions are within "
+                 f"+/-{sample['error_bounds']['proportion']:.2%} at 95% confidence. "
+                 f"Row counts, missing values and min/max are exact.\n\n")
     text += "Column Types:\n" + str(summary['column_types']) + "\n\n"
     text += "Missing Values:\n" + str(summary['missing_values']) + "\n\n"
     text += "Duplicates: " + str(summary['duplicates']) + "\n\n"
@@ -53,8 +216,13 @@ def format_summary_for_llm(summary: dict) -> str:
     
     # For LLM, we might not want the FULL correlation matrix if it's huge, 
     # but we can provide high correlations still or a summary.
-    # Let's extract high correlations manually for the text prompt to avoid token limit overflow
-    if "correlations" in summary:
+    if "high_correlations" in summary:
+        # Already thresholded and sorted by strength by the correlation engine
+        high_corrs = [f"{pair}: {val}" for pair, val in summary["high_correlations"].items()]
+        if high_corrs:
+            text += f"High Correlations (>{correlation.CORR_THRESHOLD}):\n" + str(high_corrs[:20]) + "\n\n" # Limit to top 20 for prompt
+    elif "correlations" in summary:
+        # Older summaries: extract high correlations manually to avoid token limit overflow
         high_corrs = []
         corr_dict = summary["correlations"]
         for col1, values in corr_dict.items():
@@ -72,41 +240,11 @@ def format_summary_for_llm(summary: dict) -> str:
 def generate_excel_report(df: pd.DataFrame, summary: dict, output_path: str):
     """
     Saves the EDA summary and raw data samples to an Excel file with multiple sheets.
+    Written with openpyxl's streaming (write-only) mode; see app.core.ml.eda_report for
+    the background job and the cheaper html/parquet formats.
     """
     try:
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            # Sheet 1: General Summary
-            general_data = {
-                "Metric": ["Rows", "Columns", "Duplicates (Checked)", "Missing Values Total"],
-                "Value": [summary["rows"], summary["columns"], summary["duplicates"], sum(summary["missing_values"].values())]
-            }
-            pd.DataFrame(general_data).to_excel(writer, sheet_name="Overview", index=False)
-            
-            # Sheet 2: Column Types
-            pd.DataFrame(list(summary["column_types"].items()), columns=["Column", "Type"]).to_excel(writer, sheet_name="Column Types", index=False)
-            
-            # Sheet 3: Missing Values
-            pd.DataFrame(list(summary["missing_values"].items()), columns=["Column", "Missing Count"]).to_excel(writer, sheet_name="Missing Values", index=False)
-            
-            # Sheet 4: Numerical Stats
-            if "numerical_stats" in summary:
-                pd.DataFrame(summary["numerical_stats"]).to_excel(writer, sheet_name="Numerical Stats")
-
-            # Sheet 5: Categorical Stats
-            if "categorical_stats" in summary and summary["categorical_stats"]:
-                 cat_report = []
-                 for col, stats in summary["categorical_stats"].items():
-                     stats["Column"] = col
-                     cat_report.append(stats)
-                 pd.DataFrame(cat_report).set_index("Column").to_excel(writer, sheet_name="Categorical Stats")
-                
-            # Sheet 6: Correlations (Full Matrix)
-            if "correlations" in summary:
-                 pd.DataFrame(summary["correlations"]).to_excel(writer, sheet_name="Correlation Matrix")
-                 
-            # Sheet 7: Data Sample
-            df.head(20).to_excel(writer, sheet_name="Data Sample (First 20)", index=False)
-            
+        eda_report.write_excel(df.head(20), summary, output_path)
         return True
     except Exception as e:
         print(f"Error generating Excel report: {e}")
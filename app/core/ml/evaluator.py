@@ -5,6 +5,8 @@ import shap
 import matplotlib.pyplot as plt
 from fairlearn.metrics import MetricFrame, selection_rate, false_positive_rate, false_negative_rate
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from sklearn.pipeline import Pipeline
+import scipy.sparse as sp
 import os
 
 MLFLOW_URI = os.getenv("MLFLOW_TRACKING_URI", "http://mlflow:5000")
@@ -72,6 +74,13 @@ class Evaluator:
         X = df.drop(columns=[target])
         # Use a sample for speed
         X_sample = X.sample(min(100, len(X)))
+        if isinstance(model, Pipeline):
+            # Logged with its encoder (sparse one-hot of category columns): explain the
+            # estimator on the encoded features
+            encoder, model = model[:-1], model[-1]
+            encoded = encoder.transform(X_sample)
+            X_sample = pd.DataFrame(encoded.toarray() if sp.issparse(encoded) else encoded,
+                                    columns=encoder.get_feature_names_out())
         
         # KernelExplainer works for any model, TreeExplainer is faster for Trees
         # Try TreeExplainer first if available (XGB, LightGBM, RF)
@@ -93,7 +102,7 @@ class Evaluator:
         else:
             vals = np.abs(shap_values).mean(0)
             
-        feature_importance = pd.DataFrame(list(zip(X.columns, vals)), columns=['col_name','feature_importance_vals'])
+        feature_importance = pd.DataFrame(list(zip(X_sample.columns, vals)), columns=['col_name','feature_importance_vals'])
         feature_importance.sort_values(by=['feature_importance_vals'], ascending=False, inplace=True)
         
         return feature_importance.head(20).to_dict(orient='records')
@@ -1,72 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
 import pandas as pd
-import numpy as np
-from sklearn.compose import ColumnTransformer
-from sklearn.impute import SimpleImputer
-from sklearn.preprocessing import StandardScaler, MinMaxScaler, OneHotEncoder, LabelEncoder, FunctionTransformer
-from sklearn.pipeline import Pipeline
+from app.core.ml.feature_pipeline import FeaturePipeline
+from app.core.utils.data_io import DEFAULT_CHUNK_ROWS
+
+# Fitted step states are memoized by plan prefix: the state of step i only depends on the
+# data and on steps[0..i], so it is cached under a hash of (dataset key, steps[0..i]).
+# Editing step i of a plan and applying it again refits only steps i..n.
+
+STATE_CACHE_ENTRIES = int(os.getenv("FEATURE_STATE_CACHE_ENTRIES", "10000"))
+
+
+def prefix_keys(dataset_key: str, steps: list) -> list:
+    """
+    Chained hashes of the plan prefixes: key i covers the dataset and steps[0..i] (column and operation).
+    """
+    keys = []
+    digest = dataset_key.encode()
+    for step in steps:
+        digest = hashlib.blake2b(digest + json.dumps([step["column"], step["operation"]]).encode(),
+                                 digest_size=16).digest()
+        keys.append(digest.hex())
+    return keys
+
+
+class StepStateCache:
+    """
+    Bounded LRU of fitted step states keyed by plan prefix (see prefix_keys).
+    States are shared, not copied: treat them as read-only.
+    """
+    def __init__(self, max_entries: int = STATE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, keys: list) -> dict:
+        """
+        Cached states for `keys`, as {step position: state}.
+        """
+        states = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                state = self._entries.get(key)
+                if state is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                states[i] = state
+        return states
+
+    def store(self, keys: list, steps: list):
+        with self._lock:
+            for key, step in zip(keys, steps):
+                self._entries[key] = step["state"]
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+
+step_state_cache = StepStateCache()
+
 
 class FeatureEngine:
-    def apply_plan(self, df: pd.DataFrame, plan: dict) -> pd.DataFrame:
+    """
+    Fits and applies feature plans. Pass a `dataset_key` (a content fingerprint of the data,
+    e.g. summary_store.summary_key) to reuse the fitted states of unchanged plan prefixes.
+    """
+    def __init__(self, cache: StepStateCache = step_state_cache):
+        self.cache = cache
+        self.reused_steps = 0 # Steps of the last fit served from the cache
+
+    def _cached_states(self, plan: dict, dataset_key: str) -> tuple:
+        if dataset_key is None:
+            return None, None
+        keys = prefix_keys(dataset_key, plan["steps"])
+        states = self.cache.lookup(keys)
+        self.reused_steps = len(states)
+        return keys, states
+
+    def _remember(self, keys: list, pipeline: FeaturePipeline):
+        if keys is not None:
+            self.cache.store(keys, pipeline.steps)
+
+    def compile_plan(self, df: pd.DataFrame, plan: dict, dataset_key: str = None) -> FeaturePipeline:
+        """
+        Fits the transformation plan on the dataframe and returns the fitted pipeline
+        (learned fill values, vocabularies and scaler parameters), to be saved and
+        applied to validation or scoring data with FeaturePipeline.transform.
+        """
+        return self.fit_plan(df, plan, dataset_key)[0]
+
+    def fit_plan(self, df: pd.DataFrame, plan: dict, dataset_key: str = None) -> tuple:
+        """
+        Fits the plan and transforms the dataframe in one go. Returns (pipeline, transformed frame).
+        """
+        keys, states = self._cached_states(plan, dataset_key)
+        pipeline, transformed = FeaturePipeline.fit_transform(df, plan, states)
+        self._remember(keys, pipeline)
+        return pipeline, transformed
+
+    def apply_plan(self, df: pd.DataFrame, plan: dict, dataset_key: str = None) -> pd.DataFrame:
+        """
+        Applies the transformation plan to the dataframe, fitting every step on the data.
+        Steps run in plan order; steps on columns that do not exist (anymore) are skipped.
+        """
+        return self.fit_plan(df, plan, dataset_key)[1]
+
+    def apply_plan_to_file(self, filepath: str, plan: dict, dest: str, chunk_rows: int = None,
+                           dataset_key: str = None) -> tuple:
         """
-        Applies the transformation plan to the dataframe.
-        This is a simplified implementation. Real-world would use Sklearn Pipelines properly to persist state.
-        For this prototype, we'll apply transformations directly/step-by-step or build a composite pipeline.
-        
-        To allow OOT validation later, we MUST return a fitted pipeline.
-        But for the interactive UI, we often just want the transformed data.
-        
-        Hybrid approach:
-        We will build a ColumnTransformer based on the plan.
+        Out-of-core apply_plan for files larger than memory: fits the plan by streaming `filepath`,
+        then streams the transformed chunks into a Parquet file at `dest`.
+        The output is identical to apply_plan on the loaded dataset.
+        Returns (pipeline, {"rows", "columns"}).
         """
-        transformers = []
-        
-        # Group by operation to build ColumnTransformer
-        # Note: This simple logic assumes non-conflicting steps (e.g. impute then scale on same col is hard with just one ColumnTransformer without chaining).
-        # A more robust way is to use a Pipeline for each column, but that's verbose.
-        # Let's simple apply manually for the "Interactive" aspect, and just log the steps for the final pipeline.
-        
-        df_transformed = df.copy()
-        
-        for step in plan['steps']:
-            col = step['column']
-            op = step['operation']
-            
-            if col not in df_transformed.columns and op != 'drop':
-                continue
-                
-            if op == 'drop':
-                if col in df_transformed.columns:
-                    df_transformed.drop(columns=[col], inplace=True)
-            
-            elif op == 'impute_mean':
-                df_transformed[col] = df_transformed[col].fillna(df_transformed[col].mean())
-            
-            elif op == 'impute_median':
-                df_transformed[col] = df_transformed[col].fillna(df_transformed[col].median())
-                
-            elif op == 'log_transform':
-                 # Handle zeros/negatives
-                 if (df_transformed[col] > 0).all():
-                     df_transformed[col] = np.log1p(df_transformed[col])
-                     
-            elif op == 'one_hot':
-                # Pandas get_dummies is easier for interactive view than OneHotEncoder
-                dummies = pd.get_dummies(df_transformed[col], prefix=col, drop_first=True)
-                df_transformed = pd.concat([df_transformed, dummies], axis=1)
-                df_transformed.drop(columns=[col], inplace=True)
-                
-            elif op == 'label_encode':
-                le = LabelEncoder()
-                # Handle NaNs before encoding if not imputed
-                df_transformed[col] = df_transformed[col].astype(str)
-                df_transformed[col] = le.fit_transform(df_transformed[col])
-                
-            elif op == 'standard_scale':
-                scaler = StandardScaler()
-                df_transformed[[col]] = scaler.fit_transform(df_transformed[[col]])
-            
-            elif op == 'minmax_scale':
-                scaler = MinMaxScaler()
-                df_transformed[[col]] = scaler.fit_transform(df_transformed[[col]])
-                
-        return df_transformed
+        chunk_rows = chunk_rows or DEFAULT_CHUNK_ROWS
+        keys, states = self._cached_states(plan, dataset_key)
+        pipeline = FeaturePipeline.fit_file(filepath, plan, chunk_rows, states)
+        self._remember(keys, pipeline)
+        return pipeline, pipeline.transform_file(filepath, dest, chunk_rows)
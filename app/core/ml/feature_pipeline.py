@@ -0,0 +1,688 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from app.core.ml.sketches import Moments
+from app.core.utils import ingest
+from app.core.utils.data_io import iter_chunks, read_head, DEFAULT_CHUNK_ROWS
+
+# Fitted feature pipelines.
+# A plan from the feature agent is compiled against the data it is applied to: every step
+# learns its parameters (fill values, whether the log applies, one-hot vocabularies, label
+# classes, scaler parameters) once, in plan order. The fitted pipeline is stored as JSON
+# next to the transformed file and in the MLflow run of the models trained on it, and
+# transforms validation or scoring data with exactly those parameters, without refitting.
+#
+# Parameters are accumulated over fixed blocks of FIT_BLOCK_ROWS rows with mergeable
+# accumulators, both for frames in memory and for files streamed from disk (fit_file /
+# transform_file), so a file too large for memory gets exactly the pipeline, and the
+# output, the in-memory engine would produce.
+
+PIPELINE_VERSION = 1
+FIT_BLOCK_ROWS = int(os.getenv("FEATURE_FIT_BLOCK_ROWS", "65536"))
+# Candidate values a median may hold in memory before it narrows them down with another pass
+MEDIAN_MAX_CANDIDATES = int(os.getenv("FEATURE_MEDIAN_MAX_CANDIDATES", str(DEFAULT_CHUNK_ROWS)))
+# one_hot columns with more categories are kept as one pandas category column instead of
+# indicator columns (native categoricals for LightGBM / XGBoost, sparse for other models)
+ONE_HOT_MAX_CATEGORIES = int(os.getenv("FEATURE_ONE_HOT_MAX_CATEGORIES", "256"))
+
+
+def pipeline_path(filepath: str) -> str:
+    return f"{filepath}.pipeline.json"
+
+
+def _scalar(value):
+    # numpy scalars -> Python values for the JSON artifact
+    return value.item() if hasattr(value, "item") else value
+
+
+def _as_float(series) -> np.ndarray:
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biuf":
+        return np.asarray(series, dtype=np.float64)
+    try:
+        # Numeric objects / extension types; text is an error rather than a column of NaN
+        return pd.to_numeric(series, errors="raise").to_numpy(dtype=np.float64, na_value=np.nan)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Column '{getattr(series, 'name', None)}' is not numeric ({series.dtype}): {e}") from None
+
+
+def _float_dtype(values):
+    # Output dtype of a scaled column: float inputs keep their precision, like sklearn's scalers
+    dtype = values.dtype
+    return dtype if isinstance(dtype, np.dtype) and dtype.kind == "f" else np.dtype(np.float64)
+
+
+def _category_index(state: dict) -> pd.Index:
+    categories = pd.Index(state["categories"])
+    try:
+        return categories.astype(state["dtype"])
+    except (TypeError, ValueError):
+        return categories
+
+
+_SIGN_BIT = np.uint64(1 << 63)
+_DIGIT_BITS = 16
+
+
+def _sort_keys(values: np.ndarray) -> np.ndarray:
+    # Order-preserving map of float64 values to uint64 bit patterns
+    bits = values.view(np.uint64)
+    return np.where(bits & _SIGN_BIT, ~bits, bits | _SIGN_BIT)
+
+
+def _key_value(key) -> float:
+    key = np.uint64(key)
+    bits = key & ~_SIGN_BIT if key & _SIGN_BIT else ~key
+    return float(np.array([bits], dtype=np.uint64).view(np.float64)[0])
+
+
+class _Median:
+    """
+    Exact median of a column fed block by block, over as many passes as it needs.
+    The first pass counts the values, keeping them while there are at most
+    MEDIAN_MAX_CANDIDATES. Otherwise every later pass histograms the next 16 bits of the
+    values' sortable bit patterns around each middle rank, until few enough candidates
+    remain to keep and select from. Memory stays bounded by the histogram and the candidates.
+    """
+    def __init__(self):
+        self.n = 0
+        self.kept = []
+        self.targets = None # Per middle rank: rank among the candidates, bit prefix, prefix length
+        self.value = None
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if self.targets is None:
+            self.n += len(values)
+            if self.kept is not None:
+                self.kept.append(values)
+                if self.n > MEDIAN_MAX_CANDIDATES:
+                    self.kept = None
+            return
+        keys = _sort_keys(values)
+        for target in self.targets:
+            if "value" in target:
+                continue
+            bits = target["bits"]
+            candidates = keys if bits == 0 else keys[(keys >> np.uint64(64 - bits)) == target["prefix"]]
+            if target["kept"] is not None:
+                target["kept"].append(candidates)
+            else:
+                digits = (candidates >> np.uint64(64 - bits - _DIGIT_BITS)) & np.uint64((1 << _DIGIT_BITS) - 1)
+                target["hist"] += np.bincount(digits.astype(np.intp), minlength=1 << _DIGIT_BITS)
+
+    def finish(self) -> bool:
+        """
+        Ends a pass. Returns True once the median is known (self.value), False if another pass is needed.
+        """
+        if self.targets is None:
+            if self.n == 0:
+                self.value = np.nan
+                return True
+            ranks = sorted({(self.n - 1) // 2, self.n // 2})
+            if self.kept is not None:
+                values = np.concatenate(self.kept)
+                middle = np.partition(values, ranks)[ranks]
+                self.value = float((middle[0] + middle[-1]) / 2) if len(ranks) > 1 else float(middle[0])
+                self.kept = None
+                return True
+            self.targets = [self._target(rank, np.uint64(0), 0, self.n) for rank in ranks]
+            return False
+
+        for target in self.targets:
+            if "value" in target:
+                continue
+            if target["kept"] is not None:
+                keys = np.concatenate(target["kept"])
+                target["value"] = _key_value(np.partition(keys, target["rank"])[target["rank"]])
+                continue
+            counts = np.cumsum(target["hist"])
+            digit = int(np.searchsorted(counts, target["rank"], side="right"))
+            below = int(counts[digit - 1]) if digit else 0
+            prefix = (target["prefix"] << np.uint64(_DIGIT_BITS)) | np.uint64(digit)
+            bits = target["bits"] + _DIGIT_BITS
+            if bits == 64:
+                target["value"] = _key_value(prefix)
+            else:
+                target.update(self._target(target["rank"] - below, prefix, bits, int(target["hist"][digit])))
+        if any("value" not in target for target in self.targets):
+            return False
+        values = [target["value"] for target in self.targets]
+        self.value = (values[0] + values[-1]) / 2 if len(values) > 1 else values[0]
+        return True
+
+    @staticmethod
+    def _target(rank: int, prefix, bits: int, candidates: int) -> dict:
+        # Few candidates left: keep them next pass, otherwise histogram the next digit
+        keep = candidates <= MEDIAN_MAX_CANDIDATES
+        return {"rank": rank, "prefix": prefix, "bits": bits,
+                "kept": [] if keep else None, "hist": None if keep else np.zeros(1 << _DIGIT_BITS, dtype=np.int64)}
+
+
+class _Categories:
+    """
+    Vocabulary of a column across blocks, ordered like pd.Categorical over the whole column.
+    """
+    def __init__(self):
+        self.values = None
+        self.from_dtype = False
+
+    def update(self, values):
+        categories = pd.Categorical(values).categories
+        # Categorical columns keep the order of their dtype; anything else is sorted at the end
+        self.from_dtype = self.from_dtype or isinstance(getattr(values, "dtype", None), pd.CategoricalDtype)
+        self.values = categories if self.values is None else self.values.append(categories).unique()
+
+    def categories(self) -> pd.Index:
+        if self.values is None:
+            return pd.Index([])
+        return self.values if self.from_dtype else pd.Categorical(self.values).categories
+
+
+class _StepStats:
+    """
+    Accumulates the parameters of the steps of one operation in one stage, block by block.
+    """
+    def __init__(self, op: str, cols: list):
+        self.op, self.cols = op, cols
+        if op in ("impute_mean", "standard_scale", "minmax_scale"):
+            self.moments = Moments(len(cols))
+        elif op == "impute_median":
+            self.medians = [_Median() for _ in cols]
+        elif op == "log_transform":
+            self.positive = np.ones(len(cols), dtype=bool)
+        elif op == "one_hot":
+            self.vocabularies = [_Categories() for _ in cols]
+        elif op == "label_encode":
+            self.classes = [set() for _ in cols]
+
+    def update(self, block: dict):
+        op = self.op
+        if op in ("impute_mean", "standard_scale", "minmax_scale"):
+            self.moments.update(_float_matrix([block[col] for col in self.cols]))
+        elif op == "impute_median":
+            for median, col in zip(self.medians, self.cols):
+                median.update(_as_float(block[col]))
+        elif op == "log_transform":
+            # Only strictly positive columns (no missing values) are log-transformed
+            self.positive &= (_float_matrix([block[col] for col in self.cols]) > 0).all(axis=0)
+        elif op == "one_hot":
+            for vocabulary, col in zip(self.vocabularies, self.cols):
+                vocabulary.update(block[col])
+        elif op == "label_encode":
+            for classes, col in zip(self.classes, self.cols):
+                classes.update(pd.Series(block[col]).astype(str).unique())
+
+    def finish(self) -> bool:
+        # Only medians may need more than one pass
+        if self.op == "impute_median":
+            return all([median.value is not None or median.finish() for median in self.medians])
+        return True
+
+    def states(self) -> list:
+        op = self.op
+        if op == "impute_median":
+            return [{"value": median.value} for median in self.medians]
+        if op == "log_transform":
+            return [{"apply": bool(positive)} for positive in self.positive]
+        if op == "one_hot":
+            # Same vocabulary and column names as pd.get_dummies(prefix=col, drop_first=True);
+            # high-cardinality columns become a single category column over that vocabulary
+            states = []
+            for vocabulary, col in zip(self.vocabularies, self.cols):
+                categories = vocabulary.categories()
+                categorical = len(categories) > ONE_HOT_MAX_CATEGORIES
+                states.append({
+                    "categories": [_scalar(value) for value in categories],
+                    "dtype": str(categories.dtype),
+                    "encoding": "categorical" if categorical else "one_hot",
+                    "columns": [] if categorical else [f"{col}_{value}" for value in categories[1:]]
+                })
+            return states
+        if op == "label_encode":
+            # LabelEncoder on the string form: sorted distinct values
+            return [{"classes": sorted(classes)} for classes in self.classes]
+
+        moments = self.moments
+        empty = moments.n == 0
+        nan_if_empty = lambda values: [np.nan if e else float(v) for e, v in zip(empty, values)]
+        if op == "impute_mean":
+            return [{"value": value} for value in nan_if_empty(moments.mean)]
+        if op == "standard_scale":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                var = moments.m2 / moments.n
+            n, mean = moments.n, moments.mean
+            # Near-constant columns are only centered, like StandardScaler
+            eps = np.finfo(np.float64).eps
+            constant = empty | (var <= n * eps * var + (n * mean * eps) ** 2)
+            scale = np.where(constant, 1.0, np.sqrt(np.where(empty, 0.0, var)))
+            return [{"mean": m, "scale": float(sc)} for m, sc in zip(nan_if_empty(mean), scale)]
+        data_min, data_max = nan_if_empty(moments.min), nan_if_empty(moments.max)
+        states = []
+        for lo, hi, e in zip(data_min, data_max, empty):
+            scale = 1.0 / (hi - lo) if not e and hi - lo >= 10 * np.finfo(np.float64).eps else 1.0
+            states.append({"min": lo, "max": hi, "scale": scale, "offset": 0.0 if e else -lo * scale})
+        return states
+
+
+def _fit_stage(groups: list, steps: list, blocks):
+    """
+    Fits the (op, [step indices]) groups of one stage. `blocks()` yields the stage's input as
+    column dicts of FIT_BLOCK_ROWS rows, once per pass; passes repeat until every statistic is final.
+    """
+    stats = [(_StepStats(op, [steps[i]["column"] for i in indices]), indices) for op, indices in groups]
+    pending = [stat for stat, _ in stats]
+    while pending:
+        for block in blocks():
+            for stat in pending:
+                stat.update(block)
+        pending = [stat for stat in pending if not stat.finish()]
+    for stat, indices in stats:
+        for i, state in zip(indices, stat.states()):
+            steps[i]["state"] = state
+
+
+def _chunk_dtypes(filepath: str, chunk_rows: int) -> dict:
+    # CSV chunks get the numeric / bool dtype the whole file needs, so chunks are typed like a full read
+    if not filepath.endswith(".csv"):
+        return None
+    return {col: dtype for col, dtype in ingest.csv_dtypes(filepath, chunk_rows).items() if dtype != "str"}
+
+
+def _rechunk(chunks, rows: int):
+    # Re-slices a stream of frames into frames of exactly `rows` rows (the last one may be shorter)
+    buffer, buffered = [], 0
+    for chunk in chunks:
+        start = 0
+        while start < len(chunk):
+            take = min(rows - buffered, len(chunk) - start)
+            buffer.append(chunk.iloc[start:start + take])
+            buffered += take
+            start += take
+            if buffered == rows:
+                yield buffer[0] if len(buffer) == 1 else pd.concat(buffer)
+                buffer, buffered = [], 0
+    if buffer:
+        yield buffer[0] if len(buffer) == 1 else pd.concat(buffer)
+
+
+def _apply_step(op: str, state: dict, series: pd.Series):
+    """
+    Transforms one column with fitted parameters (one_hot is always batched, see _run_one_hot).
+    """
+    if op in ("impute_mean", "impute_median"):
+        return series.fillna(state["value"])
+
+    if op == "log_transform":
+        return np.log1p(series) if state["apply"] else series
+
+    if op == "label_encode":
+        # Unseen labels are encoded as -1
+        codes = pd.Categorical(series.astype(str), categories=state["classes"]).codes
+        return pd.Series(codes.astype(np.int64), index=series.index, name=series.name)
+
+    if op == "standard_scale":
+        scaled = (_as_float(series) - state["mean"]) / state["scale"]
+        return pd.Series(scaled.astype(_float_dtype(series), copy=False), index=series.index, name=series.name)
+
+    if op == "minmax_scale":
+        scaled = _as_float(series) * state["scale"] + state["offset"]
+        return pd.Series(scaled.astype(_float_dtype(series), copy=False), index=series.index, name=series.name)
+
+    return series
+
+
+def _schedule(steps: list) -> list:
+    """
+    Groups plan steps into stages that can run as batches.
+    A step depends on the previous steps touching its column, and on earlier one_hot steps
+    that may have created it (or whose indicators may overwrite it); every step goes into the
+    first stage after all its dependencies. Within a stage no two steps share a column, so
+    the steps of one operation run together as a single batch.
+    Returns [[(operation, [step indices]), ...], ...].
+    """
+    last = {} # column -> stage of the last step that touched it
+    one_hots = [] # (indicator prefix, stage)
+    stages = []
+    for i, step in enumerate(steps):
+        col, op = step["column"], step["operation"]
+        stage = last.get(col, -1) + 1
+        for prefix, level in one_hots:
+            if col.startswith(prefix):
+                stage = max(stage, level + 1)
+        if op == "one_hot":
+            prefix = f"{col}_"
+            for other, level in last.items():
+                if other.startswith(prefix):
+                    stage = max(stage, level + 1)
+            one_hots.append((prefix, stage))
+        last[col] = stage
+        if stage == len(stages):
+            stages.append({})
+        stages[stage].setdefault(op, []).append(i)
+    return [list(groups.items()) for groups in stages]
+
+
+def _float_matrix(series: list) -> np.ndarray:
+    # Column-major so every column is contiguous (per-column reductions, cheap column views)
+    matrix = np.empty((len(series[0]), len(series)), dtype=np.float64, order="F")
+    for j, values in enumerate(series):
+        matrix[:, j] = _as_float(values)
+    return matrix
+
+
+def _rows(values, start: int, stop: int):
+    return values.iloc[start:stop] if isinstance(values, pd.Series) else values[start:stop]
+
+
+def _exact_float(dtype) -> bool:
+    # Columns whose values convert to float64 exactly and whose fillna/log1p results are float64
+    return isinstance(dtype, np.dtype) and (dtype == np.float64 or dtype.kind in "iu") and dtype.itemsize >= 4
+
+
+# Batched operations. `columns` maps names to Series (input columns) or 1D arrays (columns
+# already transformed by a batch, kept as views of the batch result until the final frame).
+
+def _run_impute(op: str, cols: list, states: list, columns: dict, index: pd.Index):
+    batch = [j for j, col in enumerate(cols) if _exact_float(columns[col].dtype)]
+    if batch:
+        matrix = _float_matrix([columns[cols[j]] for j in batch])
+        missing = np.isnan(matrix)
+        fill = np.array([states[j]["value"] for j in batch], dtype=np.float64)
+        # Integer columns have no missing values: only float columns change
+        changed = missing.any(axis=0) & ~np.isnan(fill)
+        if changed.any():
+            filled = np.where(missing[:, changed], fill[changed], matrix[:, changed])
+            for k, j in enumerate(np.flatnonzero(changed)):
+                columns[cols[batch[j]]] = filled[:, k]
+    # Other dtypes (float32, objects, extension types) keep their pandas semantics column by column
+    _run_columns(op, cols, states, columns, index, positions=sorted(set(range(len(cols))) - set(batch)))
+
+
+def _run_log(op: str, cols: list, states: list, columns: dict, index: pd.Index):
+    batch = [j for j, col in enumerate(cols) if _exact_float(columns[col].dtype) and states[j]["apply"]]
+    if batch:
+        logged = np.log1p(_float_matrix([columns[cols[j]] for j in batch]))
+        for k, j in enumerate(batch):
+            columns[cols[j]] = logged[:, k]
+    _run_columns(op, cols, states, columns, index, positions=sorted(set(range(len(cols))) - set(batch)))
+
+
+def _run_scale(op: str, cols: list, states: list, columns: dict, index: pd.Index):
+    matrix = _float_matrix([columns[col] for col in cols])
+    if op == "standard_scale":
+        scaled = (matrix - np.array([state["mean"] for state in states])) / np.array([state["scale"] for state in states])
+    else:
+        scaled = matrix * np.array([state["scale"] for state in states]) + np.array([state["offset"] for state in states])
+    for j, col in enumerate(cols):
+        columns[col] = scaled[:, j].astype(_float_dtype(columns[col]), copy=False)
+
+
+def _run_one_hot(op: str, cols: list, states: list, columns: dict, index: pd.Index):
+    # All indicators of the batch go into one column-major bool block
+    width = sum(len(state["columns"]) for state in states)
+    block = np.zeros((len(index), width), dtype=bool, order="F")
+    offset = 0
+    for col, state in zip(cols, states):
+        if state.get("encoding") == "categorical":
+            # Unseen values become missing, like all-False indicators
+            columns[col] = pd.Categorical(columns[col], categories=_category_index(state))
+            continue
+        # Values outside the fitted vocabulary (and missing values) get all-False indicators
+        codes = pd.Categorical(columns[col], categories=_category_index(state)).codes.astype(np.intp)
+        rows = np.flatnonzero(codes > 0)
+        block[rows, offset + codes[rows] - 1] = True
+        del columns[col]
+        for k, name in enumerate(state["columns"]):
+            columns[name] = block[:, offset + k]
+        offset += len(state["columns"])
+
+
+def _run_columns(op: str, cols: list, states: list, columns: dict, index: pd.Index, positions: list = None):
+    # One column at a time: operations without a batched form, and dtypes the batches do not cover
+    for j in range(len(cols)) if positions is None else positions:
+        series = columns[cols[j]]
+        if not isinstance(series, pd.Series):
+            series = pd.Series(series, index=index, name=cols[j], copy=False)
+        columns[cols[j]] = _apply_step(op, states[j], series)
+
+
+_BATCHES = {
+    "impute_mean": _run_impute,
+    "impute_median": _run_impute,
+    "log_transform": _run_log,
+    "standard_scale": _run_scale,
+    "minmax_scale": _run_scale,
+    "one_hot": _run_one_hot,
+    "label_encode": _run_columns
+}
+
+
+class FeaturePipeline:
+    """
+    A feature plan with the parameters of every step fitted.
+    Built with FeaturePipeline.fit / fit_transform (frames) or fit_file (files larger than memory),
+    applied to new data with transform / transform_file.
+    Execution is batched: steps are scheduled into stages (see _schedule) and each stage
+    imputes / scales all its numeric columns as one matrix operation and one-hot encodes all
+    its categorical columns into one block; the output frame is assembled once at the end.
+    """
+    def __init__(self, steps: list, input_columns: list, output_columns: list, rows: int = 0):
+        self.steps = steps # [{"column", "operation", "state"}]
+        self.input_columns = input_columns
+        self.output_columns = output_columns
+        self.rows = rows
+
+    @classmethod
+    def _from_plan(cls, plan: dict, input_columns: list, states: dict = None) -> "FeaturePipeline":
+        # `states`: already fitted states by step position, e.g. from the prefix cache in feature_engine
+        states = states or {}
+        steps = [{"column": step["column"], "operation": step["operation"], "state": states.get(i)}
+                 for i, step in enumerate(plan["steps"])]
+        return cls(steps, input_columns, [])
+
+    @classmethod
+    def fit_transform(cls, df: pd.DataFrame, plan: dict, states: dict = None) -> tuple:
+        """
+        Fits every step of `plan` ({"steps": [{"column", "operation"}, ...]}) on the output of the
+        steps before it and returns (pipeline, transformed frame).
+        Steps on columns that do not exist at that point are skipped, except drop.
+        Steps whose fitted state is given in `states` ({step position: state}) are only applied.
+        """
+        pipeline = cls._from_plan(plan, df.columns.tolist(), states)
+        pipeline.rows = len(df)
+        columns = {col: df[col] for col in df.columns}
+        ran = [False] * len(pipeline.steps)
+        for stage in _schedule(pipeline.steps):
+            groups = pipeline._prepare_stage(stage, columns)
+            needed = {pipeline.steps[i]["column"] for _, indices in groups for i in indices}
+            blocks = lambda: ({col: _rows(columns[col], start, start + FIT_BLOCK_ROWS) for col in needed}
+                              for start in range(0, len(df), FIT_BLOCK_ROWS))
+            _fit_stage(groups, pipeline.steps, blocks)
+            pipeline._apply_stage(stage, columns, df.index, ran)
+        transformed = pipeline._assemble(df, columns, ran)
+        pipeline.output_columns = transformed.columns.tolist()
+        return pipeline, transformed
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, plan: dict, states: dict = None) -> "FeaturePipeline":
+        return cls.fit_transform(df, plan, states)[0]
+
+    @classmethod
+    def fit_file(cls, filepath: str, plan: dict, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 states: dict = None) -> "FeaturePipeline":
+        """
+        Fits `plan` on a dataset file without loading it: every stage of the plan is fitted by
+        streaming the file (through the stages already fitted), one pass per stage plus the
+        passes medians need. Memory is bounded by the chunk size. The result equals
+        fit(load_dataset(filepath), plan). `states` as in fit_transform.
+        """
+        dtype = _chunk_dtypes(filepath, chunk_rows)
+        probe = next(iter_chunks(filepath, 1, dtype=dtype), pd.DataFrame()) # Schema of the stage inputs
+        pipeline = cls._from_plan(plan, probe.columns.tolist(), states)
+        stages = _schedule(pipeline.steps)
+        columns = {col: probe[col] for col in probe.columns}
+        rows = []
+
+        for s, stage in enumerate(stages):
+            groups = pipeline._prepare_stage(stage, columns)
+
+            def blocks(fitted=stages[:s]):
+                total = 0
+                for block in _rechunk(iter_chunks(filepath, chunk_rows, dtype=dtype), FIT_BLOCK_ROWS):
+                    block_columns = {col: block[col] for col in block.columns}
+                    for previous in fitted:
+                        pipeline._apply_stage(previous, block_columns, block.index)
+                    total += len(block)
+                    yield block_columns
+                rows.append(total)
+
+            if groups: # Stages that are only drops or already fitted need no pass
+                _fit_stage(groups, pipeline.steps, blocks)
+            pipeline._apply_stage(stage, columns, probe.index)
+
+        pipeline.rows = rows[0] if rows else sum(len(chunk) for chunk in iter_chunks(filepath, chunk_rows, dtype=dtype))
+        pipeline.output_columns = pipeline.transform(probe.head(0)).columns.tolist()
+        return pipeline
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Applies the fitted steps to new data (no statistics are recomputed).
+        Steps whose column is missing from `df` (e.g. the target in scoring data) are skipped.
+        """
+        columns = {col: df[col] for col in df.columns}
+        ran = [False] * len(self.steps)
+        for stage in _schedule(self.steps):
+            self._apply_stage(stage, columns, df.index, ran)
+        return self._assemble(df, columns, ran)
+
+    def transform_file(self, filepath: str, dest: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> dict:
+        """
+        Streams `filepath` through the fitted steps into a Parquet file at `dest`
+        (one row group per chunk). Returns {"rows", "columns"}.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tmp_path = f"{dest}.tmp"
+        dtype = _chunk_dtypes(filepath, chunk_rows)
+        writer, schema, rows = None, None, 0
+        try:
+            for chunk in iter_chunks(filepath, chunk_rows, dtype=dtype):
+                table = pa.Table.from_pandas(self.transform(chunk), preserve_index=False)
+                if writer is None:
+                    # Columns that are all missing in the first chunk are typed as strings
+                    schema = pa.schema([pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                                        for field in table.schema], metadata=table.schema.metadata)
+                    writer = pq.ParquetWriter(tmp_path, schema)
+                writer.write_table(table.cast(schema))
+                rows += table.num_rows
+            if writer is None:
+                empty = self.transform(read_head(filepath, 1).head(0)) # Empty dataset: schema only
+                pq.write_table(pa.Table.from_pandas(empty, preserve_index=False), tmp_path)
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(tmp_path, dest)
+        return {"rows": rows, "columns": self.output_columns}
+
+    def categorical_dtypes(self) -> dict:
+        """
+        Output columns that high-cardinality one_hot steps keep as pandas categories, with their dtype.
+        CSV files do not store it: restore it with df.astype(pipeline.categorical_dtypes()).
+        """
+        dtypes = {}
+        for step in self.steps:
+            col = step["column"]
+            if step["operation"] == "one_hot" and (step["state"] or {}).get("encoding") == "categorical":
+                dtypes[col] = pd.CategoricalDtype(_category_index(step["state"]))
+            else:
+                dtypes.pop(col, None) # A later step changed the column
+        return {col: dtype for col, dtype in dtypes.items() if col in self.output_columns}
+
+    def _prepare_stage(self, stage: list, columns: dict) -> list:
+        # Steps of a stage that will run: skip markers for steps on absent columns and unknown operations
+        groups = []
+        for op, indices in stage:
+            if op == "drop":
+                for i in indices:
+                    self.steps[i]["state"] = {}
+                continue
+            for i in indices:
+                # Unknown operations leave the data unchanged
+                if self.steps[i]["column"] not in columns or op not in _BATCHES:
+                    self.steps[i]["state"] = {"skip": True}
+            active = [i for i in indices if not self.steps[i]["state"]]
+            if active:
+                groups.append((op, active))
+        return groups
+
+    def _apply_stage(self, stage: list, columns: dict, index: pd.Index, ran: list = None):
+        # Columns are transformed in a dict of Series / arrays; no intermediate frame is built
+        for op, indices in stage:
+            if op == "drop":
+                for i in indices:
+                    dropped = columns.pop(self.steps[i]["column"], None) is not None
+                    if ran is not None:
+                        ran[i] = dropped
+                continue
+            active = [i for i in indices if self.steps[i]["column"] in columns and not self.steps[i]["state"].get("skip")]
+            if not active:
+                continue
+            _BATCHES[op](op, [self.steps[i]["column"] for i in active], [self.steps[i]["state"] for i in active],
+                         columns, index)
+            if ran is not None:
+                for i in active:
+                    ran[i] = True
+
+    def _assemble(self, df: pd.DataFrame, columns: dict, ran: list) -> pd.DataFrame:
+        # Output column order of sequential execution: one_hot indicators are appended
+        # after the existing columns and replace their source column
+        order = dict.fromkeys(df.columns)
+        for step, done in zip(self.steps, ran):
+            if step["operation"] == "drop":
+                order.pop(step["column"], None)
+            elif done and step["operation"] == "one_hot" and step["state"].get("encoding") != "categorical":
+                order.pop(step["column"], None)
+                order.update(dict.fromkeys(step["state"]["columns"]))
+        if not order:
+            return pd.DataFrame(index=df.index)
+        return pd.DataFrame({col: columns[col] for col in order}, index=df.index)
+
+    def to_dict(self) -> dict:
+        return {
+            "version": PIPELINE_VERSION,
+            "input_columns": self.input_columns,
+            "output_columns": self.output_columns,
+            "rows": self.rows,
+            "steps": self.steps
+        }
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "FeaturePipeline":
+        return cls(payload["steps"], payload["input_columns"], payload["output_columns"], payload.get("rows", 0))
+
+    def save(self, path: str):
+        # Write-then-rename so readers never see a half written artifact
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f, default=str)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FeaturePipeline":
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_pipeline(filepath: str):
+    """
+    The fitted pipeline that produced `filepath` (a transformed dataset), or None.
+    """
+    path = pipeline_path(filepath)
+    if not os.path.exists(path):
+        return None
+    try:
+        return FeaturePipeline.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
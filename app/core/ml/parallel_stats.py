@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# Per-column statistics computed across a process pool.
+# The columns are written once into a shared memory block as an Arrow IPC stream;
+# workers map that block and read their batch of columns zero-copy instead of
+# receiving a pickled copy of the DataFrame.
+
+BATCHES_PER_WORKER = 4
+
+
+def _numeric_stats(arr: pa.Array) -> dict:
+    values = arr.to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"count": 0.0, "mean": np.nan, "std": np.nan, "min": np.nan,
+                "25%": np.nan, "50%": np.nan, "75%": np.nan, "max": np.nan}
+    q25, q50, q75 = np.quantile(values, [0.25, 0.5, 0.75])
+    return {
+        "count": float(len(values)),
+        "mean": float(values.mean()),
+        "std": float(values.std(ddof=1)) if len(values) > 1 else np.nan,
+        "min": float(values.min()),
+        "25%": float(q25),
+        "50%": float(q50),
+        "75%": float(q75),
+        "max": float(values.max())
+    }
+
+
+def _categorical_stats(arr: pa.Array) -> dict:
+    counts = pc.value_counts(arr.drop_null())
+    values = counts.field("values").to_pylist()
+    freqs = counts.field("counts").to_pylist()
+    top, freq = "N/A", 0
+    if freqs:
+        freq = max(freqs)
+        candidates = [v for v, c in zip(values, freqs) if c == freq]
+        # Same tie-break as Series.mode(): smallest value
+        top = str(min(candidates))
+    return {
+        "unique": len(values),
+        "missing": int(arr.null_count),
+        "top": top,
+        "freq": int(freq)
+    }
+
+
+def _stats_worker(shm_name: str, size: int, num_cols: list, cat_cols: list):
+    # Workers share the parent's resource tracker, which unlinks the block once
+    shm = shared_memory.SharedMemory(name=shm_name)
+    view = shm.buf[:size]
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(view)).read_all()
+        numerical = {key: _numeric_stats(table.column(key).combine_chunks()) for key in num_cols}
+        categorical = {key: _categorical_stats(table.column(key).combine_chunks()) for key in cat_cols}
+        # Arrow buffers point into the block: drop them before unmapping
+        del table
+        return numerical, categorical
+    finally:
+        view.release()
+        shm.close()
+
+
+def _to_shared_table(df: pd.DataFrame, columns: list):
+    """
+    Serializes the convertible columns into a shared memory Arrow IPC stream.
+    Returns (shm, size, keys) where keys maps each converted column to its field name
+    in the stream; columns Arrow can't represent (e.g. mixed-type objects) are left
+    out and handled by the caller.
+    """
+    arrays, keys = [], {}
+    for col in columns:
+        try:
+            arrays.append(pa.array(df[col], from_pandas=True))
+            keys[col] = f"c{len(keys)}" # Arrow field names must be strings
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            continue
+
+    table = pa.Table.from_arrays(arrays, names=list(keys.values()))
+
+    def write(sink):
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    # Size the block first, then serialize straight into it (no intermediate copy)
+    mock = pa.MockOutputStream()
+    write(mock)
+    size = mock.size()
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        target = pa.py_buffer(shm.buf)
+        write(pa.FixedSizeBufferWriter(target))
+        del target
+    except Exception:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm, size, keys
+
+
+def _batches(columns: list, n_batches: int) -> list:
+    if not columns:
+        return []
+    n_batches = max(1, min(n_batches, len(columns)))
+    return [columns[i::n_batches] for i in range(n_batches)]
+
+
+def compute_column_stats_parallel(df: pd.DataFrame, num_cols: list, cat_cols: list, n_jobs: int):
+    """
+    Computes describe()-style numeric stats and unique/missing/top/freq categorical stats
+    for the given columns across `n_jobs` processes.
+    Returns (numerical_stats, categorical_stats, fallback_cols) where fallback_cols
+    could not be shared and still need to be computed in-process.
+    """
+    shm, size, keys = _to_shared_table(df, list(num_cols) + list(cat_cols))
+    fallback_cols = [col for col in list(num_cols) + list(cat_cols) if col not in keys]
+
+    results_num, results_cat = {}, {}
+    try:
+        # Round-robin batches so numeric and categorical work is spread evenly
+        tasks = [(keys[col], False) for col in num_cols if col in keys] + \
+                [(keys[col], True) for col in cat_cols if col in keys]
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [
+                pool.submit(_stats_worker, shm.name, size,
+                            [key for key, is_cat in batch if not is_cat],
+                            [key for key, is_cat in batch if is_cat])
+                for batch in _batches(tasks, n_jobs * BATCHES_PER_WORKER)
+            ]
+            for future in futures:
+                numerical, categorical = future.result()
+                results_num.update(numerical)
+                results_cat.update(categorical)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # Map back to column names, keeping the caller's column order
+    numerical_stats = {col: results_num[keys[col]] for col in num_cols if col in keys}
+    categorical_stats = {col: results_cat[keys[col]] for col in cat_cols if col in keys}
+    return numerical_stats, categorical_stats, fallback_cols
@@ -0,0 +1,127 @@
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from app.core.ml import sampling, summary_store
+from app.core.ml.feature_engine import FeatureEngine
+from app.core.utils import load_planner
+from app.core.utils.dataset_cache import load_dataset
+
+# Live preview of a feature plan while it is being edited.
+# The plan runs on a small stratified sample of the dataset (drawn once per dataset
+# version and kept in memory), with the prefix-memoized engine, so repeated previews of
+# a plan being edited only refit the edited tail. Output size and memory are
+# extrapolated from the transformed sample to the full table.
+
+PREVIEW_SAMPLE_ROWS = int(os.getenv("FEATURE_PREVIEW_SAMPLE_ROWS", "10000"))
+PREVIEW_CACHE_ENTRIES = int(os.getenv("FEATURE_PREVIEW_CACHE_ENTRIES", "8"))
+
+_samples = OrderedDict()
+_samples_lock = threading.Lock()
+
+
+def _draw_sample(filepath: str, sample_size: int, target_col: str, load_plan: dict) -> pd.DataFrame:
+    if load_plan["mode"] != "in_memory":
+        # One streaming pass over the file (stratified reservoir)
+        return sampling.sample_dataset(filepath, sample_size, target_col)[0]
+    df = load_dataset(filepath)
+    if len(df) <= sample_size:
+        return df.reset_index(drop=True)
+    fraction = sample_size / len(df)
+    if target_col in df.columns and df[target_col].nunique(dropna=False) <= sampling.MAX_STRATA:
+        # Proportional allocation, as in sampling.sample_dataset
+        sample = df.groupby(target_col, dropna=False, group_keys=False).sample(frac=fraction, random_state=0)
+    else:
+        sample = df.sample(n=sample_size, random_state=0)
+    return sample.reset_index(drop=True)
+
+
+def preview_sample(filepath: str, sample_size: int = PREVIEW_SAMPLE_ROWS, target_col: str = None) -> tuple:
+    """
+    Cached random sample of the (deduplicated) dataset, stratified by `target_col` if given.
+    Returns (sample, dataset key, load plan of the full dataset).
+    """
+    load_plan = load_planner.plan_load(filepath, allowed=["in_memory", "chunked"])
+    dataset_key = summary_store.summary_key(filepath)
+    key = (dataset_key, sample_size, target_col, load_plan["mode"])
+    with _samples_lock:
+        if key in _samples:
+            _samples.move_to_end(key)
+            return _samples[key], dataset_key, load_plan
+    sample = _draw_sample(filepath, sample_size, target_col, load_plan)
+    with _samples_lock:
+        _samples[key] = sample
+        while len(_samples) > PREVIEW_CACHE_ENTRIES:
+            _samples.popitem(last=False)
+    return sample, dataset_key, load_plan
+
+
+def _column_stats(series: pd.Series) -> dict:
+    stats = {"dtype": str(series.dtype), "missing": int(series.isnull().sum())}
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        if np.isfinite(values).any():
+            values = values[np.isfinite(values)]
+            stats.update(mean=float(values.mean()), std=float(values.std(ddof=1)) if len(values) > 1 else None,
+                         min=float(values.min()), max=float(values.max()))
+    else:
+        counts = series.value_counts()
+        stats.update(unique=int(len(counts)), top=str(counts.index[0]) if len(counts) else None)
+    return stats
+
+
+def _estimated_file_mb(df: pd.DataFrame, csv: bool, scale: float) -> float:
+    buffer = io.BytesIO()
+    if csv:
+        buffer.write(df.to_csv(index=False).encode())
+    else:
+        df.to_parquet(buffer, index=False)
+    return round(buffer.tell() * scale / 1024 / 1024, 2)
+
+
+def preview_plan(filepath: str, plan: dict, target_col: str = None, sample_size: int = PREVIEW_SAMPLE_ROWS) -> dict:
+    """
+    Applies `plan` to a cached sample of the dataset, without writing anything.
+    Returns the output schema, before/after stats of every input and output column,
+    the columns one_hot creates and the columns that disappear, and the estimated
+    output rows, memory and file size of /features/apply on the full table.
+    Stats are estimates from the sample (see "sample_rows").
+    """
+    start = time.perf_counter()
+    sample, dataset_key, load_plan = preview_sample(filepath, sample_size, target_col)
+    engine = FeatureEngine()
+    # Same identity as the cached sample: another target or load mode draws another sample
+    sample_key = f"preview:{dataset_key}:{len(sample)}:{target_col}:{load_plan['mode']}"
+    pipeline, transformed = engine.fit_plan(sample, plan, dataset_key=sample_key)
+
+    new_columns = []
+    for step in pipeline.steps:
+        if step["operation"] == "one_hot" and not step["state"].get("skip"):
+            new_columns.extend(col for col in step["state"]["columns"] if col in transformed.columns)
+    before = {col: _column_stats(sample[col]) for col in sample.columns}
+    after = {col: _column_stats(transformed[col]) for col in transformed.columns}
+
+    rows = load_plan["rows"]
+    scale = rows / len(transformed) if len(transformed) else 0.0
+    memory_mb = transformed.memory_usage(deep=True, index=False).sum() * scale / 1024 / 1024
+    chunked = load_plan["mode"] == "chunked"
+    return {
+        "schema": {col: str(dtype) for col, dtype in transformed.dtypes.items()},
+        "stats": {"before": before, "after": after},
+        "new_columns": new_columns,
+        "removed_columns": [col for col in sample.columns if col not in transformed.columns],
+        "estimated_output": {
+            "rows": int(rows),
+            "columns": int(len(transformed.columns)),
+            "memory_mb": round(float(memory_mb), 2),
+            # Format /features/apply writes: CSV stays CSV unless the table is processed out of core
+            "file_mb": _estimated_file_mb(transformed, filepath.endswith(".csv") and not chunked, scale),
+            "load_mode": load_plan["mode"]
+        },
+        "sample_rows": int(len(sample)),
+        "reused_steps": engine.reused_steps,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
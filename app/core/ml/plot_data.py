@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from app.core.ml import summary_store
+from app.core.ml.sketches import QuantileSketch, HyperLogLog, HeavyHitters, hash_values
+from app.core.utils.data_io import iter_chunks
+
+# Compact, cacheable plot payloads for the interactive EDA page.
+# A column is streamed once per dataset version (single-column chunks) into a fixed-bin
+# histogram, box-plot quantiles or top-N category counts; the result is cached on disk.
+
+PLOT_CACHE_DIR = "app/project_history/plot_data"
+DEFAULT_BINS = 50
+DEFAULT_TOP_N = 10
+
+
+def _cache_path(filepath: str, column: str, treat_as_cat: bool, bins: int, top_n: int) -> str:
+    key = json.dumps([summary_store.summary_key(filepath), column, treat_as_cat, bins, top_n])
+    return os.path.join(PLOT_CACHE_DIR, f"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}.json")
+
+
+def _numeric_plot_data(filepath: str, column: str, stats: dict, bins: int) -> dict:
+    lo, hi = stats.get("min"), stats.get("max")
+    if lo is None or hi is None or not np.isfinite(lo) or not np.isfinite(hi):
+        lo, hi = 0.0, 1.0 # Empty column: any edges will do
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    edges = np.linspace(lo, hi, bins + 1)
+
+    counts = np.zeros(bins, dtype=np.int64)
+    sketch = QuantileSketch()
+    missing = 0
+    for chunk in iter_chunks(filepath, columns=[column]):
+        values = pd.to_numeric(chunk[column], errors="coerce").to_numpy(dtype=np.float64)
+        missing += int(np.isnan(values).sum())
+        values = values[~np.isnan(values)]
+        counts += np.histogram(values, bins=edges)[0]
+        sketch.update(values)
+
+    q1, median, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+    count = int(counts.sum())
+    box = None
+    if count:
+        iqr = q3 - q1
+        # Whiskers at the Tukey fences clipped to the data range; outliers counted per histogram bin
+        low_fence, high_fence = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        centers = (edges[:-1] + edges[1:]) / 2
+        box = {
+            "min": float(stats["min"]),
+            "q1": q1,
+            "median": median,
+            "q3": q3,
+            "max": float(stats["max"]),
+            "whisker_low": float(max(low_fence, stats["min"])),
+            "whisker_high": float(min(high_fence, stats["max"])),
+            "outliers_low": int(counts[centers < low_fence].sum()),
+            "outliers_high": int(counts[centers > high_fence].sum())
+        }
+
+    return {
+        "kind": "numeric",
+        "count": count,
+        "missing": missing,
+        "histogram": {"bin_edges": edges.tolist(), "counts": counts.tolist()},
+        "box": box
+    }
+
+
+def _categorical_plot_data(filepath: str, column: str, top_n: int) -> dict:
+    distinct = HyperLogLog()
+    top_values = HeavyHitters(capacity=max(1000, top_n * 10))
+    count, missing = 0, 0
+    for chunk in iter_chunks(filepath, columns=[column]):
+        series = chunk[column]
+        if series.dtype == bool:
+            series = series.astype(str) # Boolean to string for categorical plotting
+        missing += int(series.isnull().sum())
+        count += int(series.notnull().sum())
+        distinct.update(hash_values(series))
+        top_values.update(series)
+
+    top = top_values.counts.sort_values(ascending=False, kind="mergesort").head(top_n)
+    return {
+        "kind": "categorical",
+        "count": count,
+        "missing": missing,
+        # Exact while every value fits the heavy-hitters table, HyperLogLog estimate above that
+        "unique": int(len(top_values.counts)) if top_values.error == 0 else distinct.count(),
+        "top": [{"value": str(value), "count": int(n)} for value, n in top.items()]
+    }
+
+
+def get_plot_data(filepath: str, column: str, treat_as_cat: bool = False,
+                  bins: int = DEFAULT_BINS, top_n: int = DEFAULT_TOP_N) -> dict:
+    """
+    Returns the plot payload for one column, computed once per dataset version and cached.
+    Numeric columns get a fixed-bin histogram and box-plot quantiles; categorical columns
+    (or integers with treat_as_cat=True) get their top-N category counts.
+    """
+    path = _cache_path(filepath, column, treat_as_cat, bins, top_n)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+    summary = summary_store.get_or_compute_summary(filepath)
+    if column not in summary["column_types"]:
+        raise KeyError(f"Column not found: {column}")
+    stats = summary["numerical_stats"].get(column)
+    if stats is not None and not treat_as_cat:
+        payload = _numeric_plot_data(filepath, column, stats, bins)
+    else:
+        payload = _categorical_plot_data(filepath, column, top_n)
+    payload.update(column=column, dtype=summary["column_types"][column])
+
+    os.makedirs(PLOT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+    return payload
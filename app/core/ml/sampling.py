@@ -0,0 +1,180 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+from app.core.ml import eda_utils
+from app.core.utils import ingest
+from app.core.utils.data_io import iter_chunks
+
+# Sampled summaries for the LLM prompts on very large tables.
+# One streaming pass draws a uniform random sample (bottom-k of random keys, i.e. a
+# reservoir), optionally stratified by the target with proportional allocation (the
+# classes are counted first, in a pass over the target column only), while
+# counting rows, missing values and numeric min/max exactly. Everything else in the
+# summary is estimated from the sample and reported with 95% error bounds.
+
+SAMPLE_ROW_THRESHOLD = int(os.getenv("SUMMARY_SAMPLE_ROW_THRESHOLD", "5000000"))
+SAMPLE_SIZE = int(os.getenv("SUMMARY_SAMPLE_SIZE", "200000"))
+MAX_STRATA = int(os.getenv("SUMMARY_MAX_STRATA", "20"))
+Z_95 = 1.96
+
+
+def should_sample(filepath: str) -> bool:
+    """
+    Whether LLM-facing summaries of this file are computed from a sample.
+    """
+    return ingest.estimate_rows(filepath) > SAMPLE_ROW_THRESHOLD
+
+
+class _Reservoir:
+    """
+    Keeps the `size` rows with the smallest random keys seen so far: a uniform sample without replacement.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.rows = None
+        self.keys = np.empty(0)
+
+    def update(self, chunk: pd.DataFrame, keys: np.ndarray):
+        if len(self.keys) >= self.size:
+            # Only rows that beat the current k-th smallest key can enter
+            select = keys < self.keys.max()
+            chunk, keys = chunk[select], keys[select]
+        if not len(keys):
+            return
+        rows = chunk if self.rows is None else pd.concat([self.rows, chunk])
+        keys = np.concatenate([self.keys, keys])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size - 1)[:self.size]
+            rows, keys = rows.iloc[keep], keys[keep]
+        self.rows, self.keys = rows, keys
+
+
+def _stratum(value):
+    # Missing target values form one stratum (NaN keys do not compare equal)
+    return None if pd.isna(value) else value
+
+
+def _strata_counts(filepath: str, target_col: str) -> dict:
+    """
+    Rows per value of `target_col` (a pass over that column only), or None for a target
+    with more than MAX_STRATA values.
+    """
+    counts = {}
+    for chunk in iter_chunks(filepath, columns=[target_col]):
+        for value, n in chunk[target_col].value_counts(dropna=False, sort=False).items():
+            counts[_stratum(value)] = counts.get(_stratum(value), 0) + int(n)
+        if len(counts) > MAX_STRATA:
+            return None # Continuous or high-cardinality target: plain random sample
+    return counts
+
+
+def sample_dataset(filepath: str, sample_size: int = SAMPLE_SIZE, target_col: str = None, seed: int = 0,
+                   columns: list = None) -> tuple:
+    """
+    Draws a random sample of `sample_size` rows (of `columns`, default all) in one pass over the (deduplicated) file.
+    With `target_col` (at most MAX_STRATA distinct values) the sample is stratified:
+    every class gets its proportional share of the sample, and at least one row. The classes
+    are counted first, in a pass over the target column, so the sampler never holds more
+    than the sample plus one chunk.
+    Returns (sample, info) where info holds the exact row/missing/min/max counts and the sampling details.
+    """
+    rng = np.random.default_rng(seed)
+    stratify = target_col is not None and (columns is None or target_col in columns)
+    stratum_rows = _strata_counts(filepath, target_col) if stratify else None
+    if stratum_rows:
+        total = sum(stratum_rows.values())
+        allocation = {value: min(n, max(1, round(sample_size * n / total))) for value, n in stratum_rows.items()}
+        strata = {value: _Reservoir(k) for value, k in allocation.items()}
+        overall = None
+    else:
+        strata, overall = None, _Reservoir(sample_size)
+    total_rows = 0
+    missing, minimum, maximum = None, {}, {}
+
+    for chunk in iter_chunks(filepath, columns=columns):
+        total_rows += len(chunk)
+        counts = chunk.isnull().sum()
+        missing = counts if missing is None else missing.add(counts, fill_value=0)
+        numeric = chunk.select_dtypes(include=[np.number])
+        for col in numeric.columns:
+            lo, hi = numeric[col].min(), numeric[col].max()
+            if pd.notnull(lo):
+                minimum[col] = min(minimum.get(col, lo), lo)
+                maximum[col] = max(maximum.get(col, hi), hi)
+
+        keys = rng.random(len(chunk))
+        if strata is None:
+            overall.update(chunk, keys)
+            continue
+        for value, idx in chunk.groupby(target_col, dropna=False, sort=False).indices.items():
+            strata[_stratum(value)].update(chunk.iloc[idx], keys[idx])
+
+    info = {
+        "method": "reservoir",
+        "total_rows": total_rows,
+        "seed": seed,
+        "missing_values": {col: int(n) for col, n in (missing if missing is not None else {}).items()},
+        "min": minimum,
+        "max": maximum
+    }
+    if strata:
+        sample = pd.concat([strata[value].rows for value in allocation if strata[value].rows is not None])
+        info.update(method="stratified", stratify_col=target_col,
+                    strata={"nan" if value is None else str(value): {"rows": stratum_rows[value], "sampled": allocation[value]}
+                            for value in allocation})
+    else:
+        sample = overall.rows if overall.rows is not None else pd.DataFrame()
+    info["sample_rows"] = int(len(sample))
+    info["fraction"] = len(sample) / total_rows if total_rows else 1.0
+    return sample.reset_index(drop=True), info
+
+
+def sampled_summary(filepath: str, target_col: str = None, sample_size: int = SAMPLE_SIZE,
+                    duplicates: int = None) -> dict:
+    """
+    Summary in the usual format, estimated from a random sample.
+    Rows, missing values and numeric min/max are exact; counts derived from the sample
+    (numeric "count", categorical "freq") are scaled to the full table; means, quantiles and
+    frequencies carry the 95% error bounds recorded in summary["sampling"]. Categorical
+    "unique" counts are lower bounds.
+    """
+    sample, info = sample_dataset(filepath, sample_size, target_col)
+    summary = eda_utils.generate_eda_summary(sample, duplicates=duplicates)
+    n, total = info["sample_rows"], info["total_rows"]
+    scale = total / n if n else 1.0
+
+    summary["rows"] = total
+    summary["missing_values"] = {col: info["missing_values"].get(col, 0) for col in summary["missing_values"]}
+    for col, stats in summary["numerical_stats"].items():
+        stats["count"] = total - summary["missing_values"].get(col, 0)
+        if col in info["min"]:
+            stats["min"], stats["max"] = float(info["min"][col]), float(info["max"][col])
+    for col, stats in summary["categorical_stats"].items():
+        stats["missing"] = summary["missing_values"].get(col, 0)
+        stats["freq"] = int(round(stats["freq"] * scale))
+
+    # Finite population correction: the bounds shrink to zero as the sample approaches the table
+    fpc = math.sqrt(max(0.0, (total - n) / (total - 1))) if total > 1 else 0.0
+    margin = Z_95 * fpc / math.sqrt(n) if n else None
+    summary["summary_mode"] = "sampled"
+    summary["sampling"] = {
+        "method": info["method"],
+        "sample_rows": n,
+        "total_rows": total,
+        "fraction": round(info["fraction"], 6),
+        "seed": info["seed"],
+        "confidence": 0.95,
+        "error_bounds": {
+            # Half-width of the interval for any proportion (worst case p = 0.5), e.g. category shares
+            "proportion": round(0.5 * margin, 6) if margin is not None else None,
+            # Half-width of the interval for each column mean
+            "mean": {col: float(stats["std"] * margin) for col, stats in summary["numerical_stats"].items()
+                     if margin is not None and pd.notnull(stats.get("std"))}
+        },
+        "exact": ["rows", "missing_values", "min", "max"]
+    }
+    if info["method"] == "stratified":
+        summary["sampling"]["stratify_col"] = info["stratify_col"]
+        summary["sampling"]["strata"] = info["strata"]
+    return summary
@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+
+# Mergeable accumulators used by the streaming EDA engine.
+# Every accumulator supports `update(...)` with one chunk of data and `merge(other)`
+# so partial results from chunks (or workers) can be combined in any order.
+
+
+class Moments:
+    """
+    Per-column count / mean / M2 / min / max using Welford's update
+    and Chan's parallel merge. All columns are updated as one vectorized operation.
+    """
+    def __init__(self, n_cols: int):
+        self.n = np.zeros(n_cols, dtype=np.float64)
+        self.mean = np.zeros(n_cols, dtype=np.float64)
+        self.m2 = np.zeros(n_cols, dtype=np.float64)
+        self.min = np.full(n_cols, np.inf)
+        self.max = np.full(n_cols, -np.inf)
+
+    def update(self, values: np.ndarray):
+        """
+        values: 2D float array (rows x columns), NaN = missing.
+        """
+        mask = ~np.isnan(values)
+        n_b = mask.sum(axis=0).astype(np.float64)
+        filled = np.where(mask, values, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(n_b > 0, filled.sum(axis=0) / np.maximum(n_b, 1), 0.0)
+        m2_b = (np.where(mask, values - mean_b, 0.0) ** 2).sum(axis=0)
+        min_b = np.where(mask, values, np.inf).min(axis=0) if len(values) else np.full(values.shape[1], np.inf)
+        max_b = np.where(mask, values, -np.inf).max(axis=0) if len(values) else np.full(values.shape[1], -np.inf)
+        self._combine(n_b, mean_b, m2_b, min_b, max_b)
+
+    def merge(self, other: "Moments"):
+        self._combine(other.n, other.mean, other.m2, other.min, other.max)
+
+    def _combine(self, n_b, mean_b, m2_b, min_b, max_b):
+        n = self.n + n_b
+        safe_n = np.maximum(n, 1)
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * n_b / safe_n
+        self.m2 = self.m2 + m2_b + delta ** 2 * self.n * n_b / safe_n
+        self.n = n
+        self.min = np.minimum(self.min, min_b)
+        self.max = np.maximum(self.max, max_b)
+
+    def std(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > 1, np.sqrt(self.m2 / np.maximum(self.n - 1, 1)), np.nan)
+
+
+class QuantileSketch:
+    """
+    KLL-style compactor sketch for approximate quantiles of a single column.
+    Exact while fewer than `k` values have been seen.
+    """
+    def __init__(self, k: int = 2048, seed: int = 0):
+        self.k = k
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values.astype(np.float64)])
+            self._compress()
+
+    def merge(self, other: "QuantileSketch"):
+        for h, items in enumerate(other.levels):
+            if h >= len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self._compress()
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            buf = self.levels[h]
+            if len(buf) > self.k:
+                buf = np.sort(buf)
+                # Keep one item behind when the buffer is odd so weights stay exact
+                leftover = buf[-1:] if len(buf) % 2 else buf[:0]
+                even = buf[:len(buf) - len(leftover)]
+                promoted = even[self._rng.integers(2)::2]
+                self.levels[h] = leftover
+                if h + 1 >= len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def quantiles(self, qs) -> list:
+        items = np.concatenate(self.levels)
+        if not len(items):
+            return [np.nan for _ in qs]
+        weights = np.concatenate([np.full(len(lvl), 2.0 ** h) for h, lvl in enumerate(self.levels)])
+        order = np.argsort(items, kind="mergesort")
+        items, weights = items[order], weights[order]
+        if len(items) == np.sum(weights):
+            # Nothing compacted yet: use pandas' linear interpolation for parity with describe()
+            return [float(np.quantile(items, q)) for q in qs]
+        cum = np.cumsum(weights)
+        total = cum[-1]
+        return [float(items[min(np.searchsorted(cum, q * total, side="left"), len(items) - 1)]) for q in qs]
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter over 64-bit hashes (see `hash_values`).
+    """
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        tail_bits = 64 - self.p
+        idx = (hashes >> np.uint64(tail_bits)).astype(np.int64)
+        tail = hashes & np.uint64((1 << tail_bits) - 1)
+        # Exact bit length via frexp (tail < 2**53 converts to float without rounding)
+        _, bit_len = np.frexp(tail.astype(np.float64))
+        rank = (tail_bits - bit_len + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction (linear counting)
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class HeavyHitters:
+    """
+    Bounded frequent-items counter (Misra-Gries style merge of per-chunk value_counts).
+    Counts are exact until more than `capacity` distinct values are seen,
+    afterwards they are lower bounds and `error` holds the largest count that was dropped.
+    """
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.error = 0
+
+    def update(self, series: pd.Series):
+        self._add(series.value_counts(dropna=True))
+
+    def merge(self, other: "HeavyHitters"):
+        self._add(other.counts)
+        self.error = max(self.error, other.error)
+
+    def _add(self, counts: pd.Series):
+        if counts.empty:
+            return
+        combined = self.counts.add(counts, fill_value=0) if not self.counts.empty else counts
+        if len(combined) > self.capacity:
+            combined = combined.sort_values(ascending=False, kind="mergesort")
+            self.error = max(self.error, int(combined.iloc[self.capacity]))
+            combined = combined.iloc[:self.capacity]
+        self.counts = combined.astype(np.int64)
+
+    def top(self):
+        """
+        Returns (value, count) of the most frequent item, or (None, 0).
+        Ties are broken like Series.mode(): the smallest value wins.
+        """
+        if self.counts.empty:
+            return None, 0
+        max_count = int(self.counts.max())
+        candidates = self.counts.index[self.counts == max_count]
+        try:
+            top = min(candidates)
+        except TypeError:
+            top = candidates[0]
+        return top, max_count
+
+
+class CoMoments:
+    """
+    Pairwise-complete co-moment sums for a Pearson correlation matrix,
+    matching DataFrame.corr() semantics for missing values.
+    Values are shifted by the first chunk's means for numerical stability.
+    """
+    def __init__(self, n_cols: int):
+        self.shift = None
+        self.n = np.zeros((n_cols, n_cols))
+        self.sx = np.zeros((n_cols, n_cols))    # sx[i, j] = sum of x_i where x_i and x_j are both present
+        self.sxx = np.zeros((n_cols, n_cols))
+        self.sxy = np.zeros((n_cols, n_cols))
+
+    def update(self, values: np.ndarray):
+        if self.shift is None:
+            with np.errstate(invalid="ignore"):
+                self.shift = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else np.zeros(values.shape[1])
+        mask = ~np.isnan(values)
+        m = mask.astype(np.float64)
+        xz = np.where(mask, values - self.shift, 0.0)
+        self.n += m.T @ m
+        self.sx += xz.T @ m
+        self.sxx += (xz ** 2).T @ m
+        self.sxy += xz.T @ xz
+
+    def merge(self, other: "CoMoments"):
+        if other.shift is None:
+            return
+        if self.shift is None:
+            self.shift = other.shift
+        # Re-express other's sums around our shift: x' = x + d
+        d = other.shift - self.shift
+        di, dj = d[:, None], d[None, :]
+        o_sx, o_sy = other.sx, other.sx.T
+        self.n += other.n
+        self.sxx += other.sxx + 2 * di * o_sx + di ** 2 * other.n
+        self.sxy += other.sxy + dj * o_sx + di * o_sy + di * dj * other.n
+        self.sx += o_sx + di * other.n
+
+    def corr(self) -> np.ndarray:
+        n, sx, sy = self.n, self.sx, self.sx.T
+        cov = n * self.sxy - sx * sy
+        var_x = n * self.sxx - sx ** 2
+        var_y = var_x.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = cov / np.sqrt(var_x * var_y)
+        r[(n < 2) | (var_x <= 0) | (var_y <= 0)] = np.nan
+        return np.clip(r, -1.0, 1.0)
+
+
+def hash_values(series: pd.Series) -> np.ndarray:
+    """
+    64-bit hashes of the non-null values of a series (stable across chunks).
+    """
+    return pd.util.hash_pandas_object(series.dropna(), index=False).to_numpy()
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+from app.core.ml import eda_utils, sampling, correlation
+from app.core.utils.dataset_cache import load_dataset
+from app.core.utils.dedup import load_duplicate_rows
+
+# EDA summaries persisted as artifacts keyed by a content fingerprint of the dataset,
+# so /eda/analyze, /features/propose and /training/propose never summarize the same data twice.
+
+SUMMARY_DIR = "app/project_history/summaries"
+FINGERPRINT_INDEX = os.path.join(SUMMARY_DIR, "fingerprints.json")
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+_index_lock = threading.Lock() # Serializes read-modify-write of the fingerprint index
+
+
+def _write_json(path: str, payload: dict):
+    # Write-then-rename so readers never see a half written artifact; the temp name is
+    # unique so concurrent writers of the same path never share (or rename away) a temp file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, default=str)
+    os.replace(tmp_path, path)
+
+
+def _load_json(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def dataset_fingerprint(filepath: str) -> str:
+    """
+    Content hash (blake2b) of a dataset file. The hash is memoized per
+    (path, size, mtime) so each version of a file is only read once.
+    """
+    stat = os.stat(filepath)
+    key = os.path.abspath(filepath)
+    index = _load_json(FINGERPRINT_INDEX)
+    entry = index.get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["fingerprint"]
+
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    fingerprint = hasher.hexdigest()
+    register_fingerprint(filepath, fingerprint)
+    return fingerprint
+
+
+def register_fingerprint(filepath: str, fingerprint: str):
+    """
+    Records a fingerprint that was computed elsewhere (e.g. while the file was written).
+    """
+    stat = os.stat(filepath)
+    with _index_lock:
+        index = _load_json(FINGERPRINT_INDEX)
+        index[os.path.abspath(filepath)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "fingerprint": fingerprint
+        }
+        _write_json(FINGERPRINT_INDEX, index)
+
+
+def column_hashes(df: pd.DataFrame) -> dict:
+    """
+    Per-column content hashes, used to find which columns changed between dataset versions.
+    """
+    hashes = {}
+    for col in df.columns:
+        row_hashes = pd.util.hash_pandas_object(df[col], index=False).to_numpy()
+        hashes[col] = hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+    return hashes
+
+
+def summary_key(filepath: str) -> str:
+    """
+    Key of the summary artifact: the file fingerprint, plus the number of rows
+    its dedup index excludes (the summary describes the deduplicated view).
+    """
+    key = dataset_fingerprint(filepath)
+    duplicate_rows = load_duplicate_rows(filepath)
+    if duplicate_rows is not None and len(duplicate_rows):
+        key = f"{key}_dedup{len(duplicate_rows)}"
+    return key
+
+
+def _artifact_path(key: str) -> str:
+    return os.path.join(SUMMARY_DIR, f"summary_{key}.json")
+
+
+def load_artifact(filepath: str) -> dict:
+    """
+    Returns the stored artifact ({"fingerprint", "summary", "column_hashes"}) for the
+    current content of `filepath`, or None.
+    """
+    artifact = _load_json(_artifact_path(summary_key(filepath)))
+    return artifact or None
+
+
+def save_summary(filepath: str, summary: dict, df: pd.DataFrame = None):
+    """
+    Persists a summary for the current content of `filepath`.
+    Passing the frame also stores per-column hashes for incremental updates.
+    """
+    key = summary_key(filepath)
+    _write_json(_artifact_path(key), {
+        "fingerprint": dataset_fingerprint(filepath),
+        "filepath": filepath,
+        "column_hashes": column_hashes(df) if df is not None else {},
+        "summary": summary
+    })
+
+
+def _sample_artifact_path(filepath: str, target_col: str = None) -> str:
+    key = f"{summary_key(filepath)}_sample"
+    if target_col:
+        key += f"_{hashlib.blake2b(target_col.encode(), digest_size=4).hexdigest()}"
+    return _artifact_path(key)
+
+
+def get_or_compute_summary(filepath: str, df: pd.DataFrame = None, streaming: bool = None, duplicates: int = None,
+                           sampled: bool = None, target_col: str = None) -> dict:
+    """
+    Returns the stored summary for this dataset, computing and persisting it if needed.
+    The file is only loaded when no artifact exists and `df` is not supplied;
+    `streaming` forces or disables the chunked engine (default: chosen from file size)
+    and a known `duplicates` count is passed through to skip the duplicate scan.
+    `sampled` estimates the summary from a random sample (stratified by `target_col` if given,
+    see app.core.ml.sampling); by default this happens above SUMMARY_SAMPLE_ROW_THRESHOLD rows
+    when no mode or frame is given. Pass sampled=False for exact statistics. An exact summary,
+    once stored, is always preferred.
+    Each call returns a fresh dict, so callers may add keys freely.
+    """
+    artifact = load_artifact(filepath)
+    if artifact:
+        return artifact["summary"]
+
+    if sampled is None:
+        sampled = df is None and streaming is None and sampling.should_sample(filepath)
+    if sampled:
+        path = _sample_artifact_path(filepath, target_col)
+        artifact = _load_json(path)
+        if artifact:
+            return artifact["summary"]
+        summary = sampling.sampled_summary(filepath, target_col=target_col, duplicates=duplicates)
+        _write_json(path, {"fingerprint": dataset_fingerprint(filepath), "filepath": filepath, "summary": summary})
+        return json.loads(json.dumps(summary, default=str))
+
+    if streaming is None:
+        streaming = df is None and eda_utils.should_stream(filepath)
+    if streaming:
+        summary = eda_utils.generate_eda_summary_streaming(filepath, duplicates=duplicates)
+    else:
+        if df is None:
+            df = load_dataset(filepath)
+        summary = eda_utils.generate_eda_summary(df, duplicates=duplicates)
+    save_summary(filepath, summary, df)
+    return json.loads(json.dumps(summary, default=str))
+
+
+def _derive_corr_matrix(numeric_df: pd.DataFrame, base_corr: dict, changed_num: list) -> dict:
+    num_cols = numeric_df.columns.tolist()
+    corr = {col: {} for col in num_cols}
+    for col1 in num_cols:
+        if col1 in changed_num:
+            continue
+        for col2 in num_cols:
+            if col2 not in changed_num:
+                corr[col1][col2] = base_corr[col1][col2]
+    for col in changed_num:
+        # Pairwise-complete like DataFrame.corr()
+        row = numeric_df.corrwith(numeric_df[col]).round(4)
+        for other, value in row.items():
+            corr[col][other] = float(value)
+            corr[other][col] = float(value)
+    # Keep the column order DataFrame.corr().to_dict() would give
+    return {col1: {col2: corr[col1][col2] for col2 in num_cols} for col1 in num_cols}
+
+
+def _parse_pairs(high_correlations: dict, columns: set) -> list:
+    """
+    Turns "col1 - col2" keys back into (col1, col2, r), keeping pairs whose columns are both in `columns`.
+    """
+    pairs = []
+    for key, value in high_correlations.items():
+        parts = key.split(" - ")
+        # Column names may themselves contain " - ": try every split point
+        for i in range(1, len(parts)):
+            col1, col2 = " - ".join(parts[:i]), " - ".join(parts[i:])
+            if col1 in columns and col2 in columns:
+                pairs.append((col1, col2, value))
+                break
+    return pairs
+
+
+def derive_summary(parent_filepath: str, df: pd.DataFrame, new_filepath: str) -> dict:
+    """
+    Builds and persists the summary of `df` (saved at `new_filepath`) from the summary of
+    the dataset it was derived from. Only new or changed columns, and the correlation
+    rows touching them, are recomputed; duplicates are always recounted.
+    """
+    parent = load_artifact(parent_filepath) if os.path.exists(parent_filepath) else None
+    if not parent or not parent.get("column_hashes"):
+        summary = eda_utils.generate_eda_summary(df)
+        save_summary(new_filepath, summary, df)
+        return summary
+
+    base = parent["summary"]
+    hashes = column_hashes(df)
+    column_types = df.dtypes.astype(str).to_dict()
+    num_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    cat_cols = df.select_dtypes(include=['object', 'category', 'bool', 'string']).columns.tolist()
+
+    def is_reusable(col):
+        if parent["column_hashes"].get(col) != hashes[col] or base["column_types"].get(col) != column_types[col]:
+            return False
+        if col in num_cols:
+            return col in base["numerical_stats"]
+        if col in cat_cols:
+            return col in base["categorical_stats"]
+        return col in base["missing_values"]
+
+    changed = [col for col in df.columns if not is_reusable(col)]
+    fresh = eda_utils.generate_eda_summary(df[changed]) if changed else None
+
+    summary = {
+        "rows": int(len(df)),
+        "columns": int(len(df.columns)),
+        "column_types": column_types,
+        "missing_values": {
+            col: (fresh["missing_values"][col] if col in changed else base["missing_values"][col])
+            for col in df.columns
+        },
+        "duplicates": int(df.duplicated().sum()),
+        "categorical_stats": {
+            col: (fresh["categorical_stats"][col] if col in changed else base["categorical_stats"][col])
+            for col in cat_cols
+        },
+        "numerical_stats": {
+            col: (fresh["numerical_stats"][col] if col in changed else base["numerical_stats"][col])
+            for col in num_cols
+        }
+    }
+    if "summary_mode" in base:
+        summary["summary_mode"] = base["summary_mode"]
+
+    if len(num_cols) > 1:
+        base_corr = base.get("correlations", {})
+        changed_num = [col for col in num_cols if col in changed or (base_corr and col not in base_corr)]
+        if not base_corr and "high_correlations" not in base:
+            changed_num = num_cols # Nothing reusable from the parent
+        if base_corr and len(num_cols) <= eda_utils.FULL_CORR_MAX_COLUMNS:
+            summary["correlations"] = _derive_corr_matrix(df[num_cols], base_corr, changed_num)
+            summary["high_correlations"] = correlation.pairs_to_dict(
+                correlation.pairs_from_matrix(pd.DataFrame(summary["correlations"]))
+            )
+        else:
+            # Wide table: keep the parent's pairs between unchanged columns and
+            # search only the pairs that involve a changed column
+            unchanged = set(num_cols) - set(changed_num)
+            pairs = _parse_pairs(base.get("high_correlations", {}), unchanged)
+            if changed_num:
+                pairs += correlation.correlation_pairs(df[num_cols], columns=changed_num)["pairs"]
+            pairs = sorted(pairs, key=lambda pair: -abs(pair[2]))[:correlation.CORR_TOP_K]
+            summary["high_correlations"] = correlation.pairs_to_dict(pairs)
+
+    save_summary(new_filepath, summary, df)
+    return summary
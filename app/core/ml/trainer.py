@@ -2,89 +2,651 @@ import optuna
 import mlflow
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import cross_val_score, StratifiedKFold, KFold
+import time
+import xgboost as xgb
+import lightgbm as lgb
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.metrics import get_scorer
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.linear_model import LogisticRegression, LinearRegression
 from xgboost import XGBClassifier, XGBRegressor
 from lightgbm import LGBMClassifier, LGBMRegressor
 from sklearn.metrics import accuracy_score, f1_score, mean_squared_error, r2_score
 import os
+import json
+import hashlib
+import uuid
+from datetime import datetime
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from threadpoolctl import threadpool_limits
+from app.core.ml.cv_data import CVData, _take
 
 MLFLOW_URI = os.getenv("MLFLOW_TRACKING_URI", "http://mlflow:5000")
 mlflow.set_tracking_uri(MLFLOW_URI)
 
+# Parallel studies: trials run in OPTUNA_N_WORKERS processes sharing a journal file storage.
+# Every trial gets OPTUNA_TRIAL_THREADS threads (default: the cores divided among the
+# workers) for the model and BLAS, so workers do not oversubscribe the CPU.
+OPTUNA_STORAGE_DIR = "app/project_history/optuna"
+OPTUNA_N_WORKERS = int(os.getenv("OPTUNA_N_WORKERS", "1"))
+OPTUNA_TRIAL_THREADS = int(os.getenv("OPTUNA_TRIAL_THREADS", "0"))
+CPU_COUNT = os.cpu_count() or 1
+# Models whose estimators take an n_jobs thread count
+THREADED_MODELS = ["xgboost", "lightgbm", "random_forest"]
+
+# Trials report their running CV score after every fold; the pruner stops hopeless trials
+# early: "median", "successive_halving", "hyperband" or "none"
+CV_FOLDS = 3
+OPTUNA_PRUNER = os.getenv("OPTUNA_PRUNER", "median")
+PRUNER_STARTUP_TRIALS = int(os.getenv("OPTUNA_PRUNER_STARTUP_TRIALS", "5"))
+
+# Boosted trials stop adding trees once the held-out fold has not improved for this many
+# rounds (0: off); the final model is refit with the trial's mean best round count
+EARLY_STOPPING_ROUNDS = int(os.getenv("OPTUNA_EARLY_STOPPING_ROUNDS", "50"))
+
+# Studies are stored per (dataset fingerprint, model type, search space) and resumed when
+# training runs again; a new dataset starts from the WARM_START_TRIALS best parameter sets
+# of the latest study over the same search space. Parameter sets a study already scored
+# are answered from its completed trials instead of being refit.
+OPTUNA_PERSIST_STUDIES = os.getenv("OPTUNA_PERSIST_STUDIES", "1") == "1"
+WARM_START_TRIALS = int(os.getenv("OPTUNA_WARM_START_TRIALS", "5"))
+
+# Multi-fidelity search on large tables: all trials run on a small stratified subsample,
+# the best PROMOTE_FRACTION of them are re-evaluated on the next (larger, nested) subsample,
+# and so on up to the full data; the best model is picked among the full-data results
+FIDELITY_RUNGS = [float(f) for f in os.getenv("OPTUNA_FIDELITY_RUNGS", "0.01,0.1,1.0").split(",")]
+PROMOTE_FRACTION = float(os.getenv("OPTUNA_PROMOTE_FRACTION", "0.33"))
+MULTI_FIDELITY_MIN_ROWS = int(os.getenv("OPTUNA_MULTI_FIDELITY_MIN_ROWS", "1000000"))
+# Rungs smaller than this are skipped: too few rows to rank the candidates
+MIN_FIDELITY_ROWS = int(os.getenv("OPTUNA_MIN_FIDELITY_ROWS", "5000"))
+
+# Models that take pandas category columns as native categoricals; the others get them as
+# sparse one-hot columns (see sparse_design), so high-cardinality columns are never densified
+NATIVE_CATEGORICAL_MODELS = ["xgboost", "lightgbm"]
+
+def sparse_design(X: pd.DataFrame):
+    """
+    CSR matrix of X with every category column one-hot encoded (missing values: all zeros).
+    Frames without category columns are returned unchanged.
+    """
+    cat_cols = X.select_dtypes(include=["category"]).columns
+    if not len(cat_cols):
+        return X
+    import scipy.sparse as sp
+    blocks = []
+    numeric = X.drop(columns=cat_cols)
+    if len(numeric.columns):
+        blocks.append(sp.csr_matrix(numeric.to_numpy(dtype=np.float64)))
+    for col in cat_cols:
+        codes = X[col].cat.codes.to_numpy()
+        rows = np.flatnonzero(codes >= 0)
+        blocks.append(sp.csr_matrix((np.ones(len(rows)), (rows, codes[rows])),
+                                    shape=(len(X), len(X[col].cat.categories))))
+    return sp.hstack(blocks, format="csr")
+
+def one_hot_encoder(X: pd.DataFrame) -> ColumnTransformer:
+    """
+    Unfitted encoder doing sparse_design's encoding of X from a frame: the other columns,
+    then the one-hot columns of every category column over its categories (unseen and missing
+    values: all zeros). Logged in front of the models trained on sparse_design, so the logged
+    model takes the same frame it was trained from.
+    """
+    cat_cols = X.select_dtypes(include=["category"]).columns.tolist()
+    numeric = [col for col in X.columns if col not in cat_cols]
+    # sklearn only takes numeric vocabularies sorted
+    categories = [np.sort(np.asarray(X[col].cat.categories)) if X[col].cat.categories.dtype.kind in "biuf"
+                  else np.asarray(X[col].cat.categories, dtype=object) for col in cat_cols]
+    return ColumnTransformer([
+        ("numeric", "passthrough", numeric),
+        ("one_hot", OneHotEncoder(categories=categories, handle_unknown="ignore", sparse_output=True,
+                                  dtype=np.float64), cat_cols)
+    ], sparse_threshold=1.0, verbose_feature_names_out=False)
+
+
+def _model_class(model_type: str, is_classification: bool):
+    if model_type == 'xgboost':
+        return XGBClassifier if is_classification else XGBRegressor
+    elif model_type == 'lightgbm':
+        return LGBMClassifier if is_classification else LGBMRegressor
+    elif model_type == 'random_forest':
+        return RandomForestClassifier if is_classification else RandomForestRegressor
+    elif model_type == 'logistic_regression':
+        return LogisticRegression if is_classification else LinearRegression
+    else:
+        raise ValueError(f"Unknown model type: {model_type}")
+
+
+def _model_params(model_type: str, params: dict, categorical: bool, threads: int) -> dict:
+    params = dict(params)
+    # Handle special params like verbosity
+    if model_type in ['xgboost', 'lightgbm']:
+        params['verbosity'] = 0
+    if model_type == 'xgboost' and categorical:
+        params['enable_categorical'] = True
+    if model_type in THREADED_MODELS:
+        params.setdefault('n_jobs', threads)
+    return params
+
+
+def make_pruner(name: str = None):
+    name = name or OPTUNA_PRUNER
+    if name == "median":
+        # n_warmup_steps=0: a trial can be dropped after its first fold
+        return optuna.pruners.MedianPruner(n_startup_trials=PRUNER_STARTUP_TRIALS, n_warmup_steps=0)
+    if name == "successive_halving":
+        return optuna.pruners.SuccessiveHalvingPruner(min_resource=1, reduction_factor=3)
+    if name == "hyperband":
+        return optuna.pruners.HyperbandPruner(min_resource=1, max_resource=CV_FOLDS, reduction_factor=3)
+    if name == "none":
+        return optuna.pruners.NopPruner()
+    raise ValueError(f"Unknown pruner: {name}")
+
+
+def fidelity_indices(y: pd.Series, fraction: float, is_classification: bool, seed: int = 0) -> np.ndarray:
+    """
+    Rows of a random `fraction` of the data, stratified by y for classification.
+    Subsamples with the same seed are nested: a smaller fraction is a subset of a larger one.
+    """
+    keys = np.random.default_rng(seed).random(len(y))
+    if not is_classification:
+        return np.sort(np.argsort(keys, kind="stable")[:max(1, round(fraction * len(y)))])
+    rows = []
+    for idx in pd.Series(np.arange(len(y))).groupby(np.asarray(y), sort=False).indices.values():
+        take = max(1, round(fraction * len(idx)))
+        rows.append(idx[np.argsort(keys[idx], kind="stable")[:take]])
+    return np.sort(np.concatenate(rows))
+
+
+def _params_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def _completed_params(study) -> set:
+    return {_params_key(trial.params) for trial in study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))}
+
+
+def _promoted(study, n: int, among: list = None) -> list:
+    # Parameters of the best `n` distinct completed trials (restricted to the `among` parameter sets)
+    allowed = {_params_key(params) for params in among} if among is not None else None
+    completed = sorted(study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,)),
+                       key=lambda trial: trial.value, reverse=True)
+    promoted = {}
+    for trial in completed:
+        key = _params_key(trial.params)
+        if allowed is not None and key not in allowed:
+            continue
+        promoted.setdefault(key, trial.params)
+        if len(promoted) == n:
+            break
+    return list(promoted.values())
+
+
+def _trials_since(study, started: datetime, state) -> list:
+    # Trials of this run in a study that may hold earlier runs
+    return [trial for trial in study.get_trials(deepcopy=False, states=(state,))
+            if started is None or (trial.datetime_start is not None and trial.datetime_start >= started)]
+
+
+def pruning_stats(study, started: datetime = None) -> dict:
+    """
+    Completed / pruned trial counts (of trials started after `started`), the trials answered
+    from the score cache, and the fold fitting time pruning saved: the folds a pruned trial
+    skipped, at that trial's mean fold time.
+    """
+    states = optuna.trial.TrialState
+    pruned = _trials_since(study, started, states.PRUNED)
+    completed = _trials_since(study, started, states.COMPLETE)
+    saved = 0.0
+    for trial in pruned:
+        fold_seconds = trial.user_attrs.get("fold_seconds", [])
+        if fold_seconds:
+            saved += np.mean(fold_seconds) * (CV_FOLDS - len(fold_seconds))
+    return {
+        "trials_completed": len(completed),
+        "trials_cached": sum("cached_from" in trial.user_attrs for trial in completed),
+        "trials_pruned": len(pruned),
+        "pruning_time_saved_s": round(float(saved), 2)
+    }
+
+
+# Trial parameters that change how the data is binned: such trials cannot reuse the
+# prebuilt native matrices of CVData and train the sklearn estimator instead
+XGB_DATA_PARAMS = ["max_bin", "tree_method", "device", "booster", "max_cat_to_onehot", "max_cat_threshold"]
+LGB_DATA_PARAMS = ["max_bin", "subsample_for_bin", "min_data_in_bin", "class_weight", "categorical_feature"]
+
+
+def _xgb_native_params(params: dict, is_classification: bool, n_classes: int) -> tuple:
+    # Same booster parameters and rounds as XGBClassifier / XGBRegressor(**params).fit
+    model = (XGBClassifier if is_classification else XGBRegressor)(**params)
+    native = {key: value for key, value in model.get_xgb_params().items() if value is not None}
+    if is_classification and n_classes > 2:
+        native.update(objective="multi:softprob", num_class=n_classes)
+    return native, model.get_num_boosting_rounds()
+
+
+def _lgb_native_params(params: dict, is_classification: bool, n_classes: int) -> tuple:
+    # Same booster parameters and rounds as LGBMClassifier / LGBMRegressor(**params).fit
+    model = (LGBMClassifier if is_classification else LGBMRegressor)(**params)
+    native = {key: value for key, value in model.get_params().items()
+              if value is not None and key not in ("n_estimators", "importance_type", "class_weight", "subsample_for_bin")}
+    if native.get("objective") is None:
+        if not is_classification:
+            native["objective"] = "regression"
+        elif n_classes > 2:
+            native.update(objective="multiclass", num_class=n_classes)
+        else:
+            native["objective"] = "binary"
+    return native, model.n_estimators
+
+
+def _predicted_codes(pred: np.ndarray) -> np.ndarray:
+    # Class codes from booster outputs: probabilities of class 1, or one column per class
+    return pred.argmax(axis=1) if pred.ndim == 2 else (pred > 0.5).astype(np.int32)
+
+
+class _Objective:
+    """
+    Cross-validated score of one trial's parameters. Module level (not a closure) so
+    worker processes of a parallel study can run it.
+    """
+    def __init__(self, X, y, config: dict, is_classification: bool, metric: str, categorical: bool, threads: int,
+                 fidelity: dict = None):
+        self.X, self.y = X, y
+        self.fidelity = fidelity # Subsample the trial is scored on, recorded with every trial
+        self.config = config
+        self.is_classification = is_classification
+        self.metric = metric
+        self.categorical = categorical
+        self.threads = threads
+        self._data = None
+
+    @property
+    def data(self) -> CVData:
+        # Built on first use, in the process that runs the trials
+        if self._data is None:
+            self._data = CVData(self.X, self.y, CV_FOLDS, self.is_classification)
+        return self._data
+
+    def __getstate__(self):
+        # Workers get the raw data, never another process's native matrices
+        return dict(self.__dict__, _data=None)
+
+    def _score(self, y_true: np.ndarray, y_pred: np.ndarray) -> float:
+        if self.metric == 'accuracy':
+            return accuracy_score(y_true, y_pred)
+        if self.metric == 'f1':
+            return f1_score(y_true, y_pred, average='macro')
+        return -mean_squared_error(y_true, y_pred)
+
+    def _fit_fold(self, model_type: str, params: dict, model, scorer, k: int) -> tuple:
+        """
+        (score, boosting rounds used or None) of one fold. Boosters train on the fold's prebuilt
+        native matrices when the trial keeps their binning, and stop early on the fold's
+        held-out rows; everything else fits the sklearn estimator.
+        """
+        data = self.data
+        n_classes = len(data.classes) if self.is_classification else 0
+        stopping = EARLY_STOPPING_ROUNDS > 0
+        if model_type == 'xgboost' and not any(key in params for key in XGB_DATA_PARAMS):
+            native, rounds = _xgb_native_params(params, self.is_classification, n_classes)
+            train, test = data.xgb_fold(k, self.categorical)
+            booster = xgb.train(native, train, num_boost_round=rounds, evals=[(test, "valid")] if stopping else (),
+                                early_stopping_rounds=EARLY_STOPPING_ROUNDS if stopping else None, verbose_eval=False)
+            used = booster.best_iteration + 1 if stopping else rounds
+            pred = booster.predict(test, iteration_range=(0, used))
+        elif model_type == 'lightgbm' and not any(key in params for key in LGB_DATA_PARAMS):
+            native, rounds = _lgb_native_params(params, self.is_classification, n_classes)
+            train, valid = data.lgb_fold(k)
+            callbacks = [lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)] if stopping else None
+            booster = lgb.train(native, train, num_boost_round=rounds, valid_sets=[valid] if stopping else None,
+                                callbacks=callbacks)
+            used = booster.best_iteration or rounds
+            pred = booster.predict(data.fold(k)[2], num_iteration=used)
+        else:
+            X_train, y_train, X_test, y_test = data.fold(k)
+            fold_model, used = clone(model), None
+            if stopping and model_type == 'xgboost':
+                fold_model.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+                fold_model.fit(X_train, y_train, eval_set=[(X_test, y_test)], verbose=False)
+                used = fold_model.best_iteration + 1
+            elif stopping and model_type == 'lightgbm':
+                fold_model.fit(X_train, y_train, eval_set=[(X_test, y_test)],
+                               callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)])
+                used = fold_model.best_iteration_ or fold_model.n_estimators
+            else:
+                fold_model.fit(X_train, y_train)
+            return scorer(fold_model, X_test, y_test), used
+        y_test = data.fold_codes(k)[1]
+        return self._score(y_test, _predicted_codes(pred) if self.is_classification else pred), used if stopping else None
+
+    def __call__(self, trial) -> float:
+        params = {}
+        for p in self.config['params']:
+            if p['type'] == 'int':
+                params[p['name']] = trial.suggest_int(p['name'], int(p['low']), int(p['high']))
+            elif p['type'] == 'float':
+                params[p['name']] = trial.suggest_float(p['name'], p['low'], p['high'])
+            elif p['type'] == 'categorical':
+                params[p['name']] = trial.suggest_categorical(p['name'], p['choices'])
+
+        # Parameter sets the study already scored (a duplicate suggestion, or an earlier run) on the
+        # same data cost nothing
+        for previous in trial.study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,)):
+            if previous.params == params and _fidelity_key(previous.user_attrs.get("fidelity")) == _fidelity_key(self.fidelity):
+                trial.set_user_attr("cached_from", previous.number)
+                for key in ("best_iterations", "fidelity"):
+                    if key in previous.user_attrs:
+                        trial.set_user_attr(key, previous.user_attrs[key])
+                return previous.value
+
+        model_type = self.config['model_type']
+        model_cls = _model_class(model_type, self.is_classification)
+        params = _model_params(model_type, params, self.categorical, self.threads)
+        model = model_cls(**params)
+
+        scoring = 'accuracy' if self.metric == 'accuracy' else 'neg_mean_squared_error'
+        if self.metric == 'f1': scoring = 'f1_macro'
+        scorer = get_scorer(scoring)
+
+        if self.fidelity is not None:
+            trial.set_user_attr("fidelity", self.fidelity)
+
+        # Fold by fold, reporting the running mean so the pruner can stop the trial early
+        scores, fold_seconds, best_iterations = [], [], []
+        for fold in range(CV_FOLDS):
+            start = time.perf_counter()
+            score, used = self._fit_fold(model_type, params, model, scorer, fold)
+            scores.append(score)
+            fold_seconds.append(time.perf_counter() - start)
+            trial.set_user_attr("fold_seconds", fold_seconds)
+            if used is not None:
+                best_iterations.append(int(used))
+                trial.set_user_attr("best_iterations", best_iterations)
+            trial.report(float(np.mean(scores)), fold)
+            if fold < CV_FOLDS - 1 and trial.should_prune():
+                raise optuna.TrialPruned()
+        return float(np.mean(scores))
+
+
+# Objective of the study a worker process runs; set by the pool initializer (inherited
+# without a copy when processes are forked)
+_worker_objective = None
+
+def _init_worker(objective: _Objective):
+    global _worker_objective
+    _worker_objective = objective
+    # BLAS / OpenMP pools of the worker get the trial budget too
+    threadpool_limits(objective.threads)
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+
+def _optimize_worker(storage_path: str, study_name: str, n_trials: int, pruner: str) -> int:
+    # The pruner is not part of the stored study: every worker builds its own
+    study = optuna.load_study(study_name=study_name, storage=_journal_storage(storage_path), pruner=make_pruner(pruner))
+    study.optimize(_worker_objective, n_trials=n_trials)
+    return n_trials
+
+
+def _journal_storage(path: str):
+    # File journal: safe for several processes on one machine, unlike SQLite under write contention
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", optuna.exceptions.ExperimentalWarning)
+        return optuna.storages.JournalStorage(optuna.storages.JournalFileStorage(path))
+
+
+def _parallel_optimize(objective: _Objective, study_name: str, storage_path: str, n_trials: int, n_workers: int,
+                       pruner: str):
+    """
+    Runs the trials of a stored study in `n_workers` processes sharing its journal file storage.
+    """
+    shares = [n_trials // n_workers + (i < n_trials % n_workers) for i in range(n_workers)]
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=context,
+                             initializer=_init_worker, initargs=(objective,)) as pool:
+        futures = [pool.submit(_optimize_worker, storage_path, study_name, share, pruner) for share in shares if share]
+        for future in futures:
+            future.result()
+
+
+def _storage_path() -> str:
+    os.makedirs(OPTUNA_STORAGE_DIR, exist_ok=True)
+    return os.path.join(OPTUNA_STORAGE_DIR, "studies.journal")
+
+
+def _optimize(objective: _Objective, n_trials: int, n_workers: int, pruner: str, enqueue: list = None,
+              study_name: str = None):
+    """
+    Runs `n_trials` trials (the `enqueue` parameter sets first) and returns the study.
+    Parameter sets the study already completed are not enqueued again; with n_trials=None
+    exactly the remaining `enqueue` sets run (none: the study is returned as is).
+    A named study is stored and resumed if it exists; parallel studies are always stored.
+    """
+    direction = "maximize" # Scores are sklearn scorers (greater is better): accuracy, f1_macro, neg_mean_squared_error
+    n_workers = min(n_workers, n_trials if n_trials is not None else len(enqueue or []))
+    storage_path = _storage_path() if study_name or n_workers > 1 else None
+    if storage_path and study_name is None:
+        study_name = f"{objective.config['model_type']}_{uuid.uuid4().hex}"
+    study = optuna.create_study(direction=direction, pruner=make_pruner(pruner), study_name=study_name,
+                                storage=_journal_storage(storage_path) if storage_path else None, load_if_exists=True)
+    done = _completed_params(study)
+    pending = [params for params in enqueue or [] if _params_key(params) not in done]
+    for params in pending:
+        study.enqueue_trial(params)
+    if n_trials is None:
+        n_trials = len(pending)
+    n_workers = min(n_workers, n_trials)
+    if n_trials == 0:
+        return study
+    if n_workers > 1:
+        _parallel_optimize(objective, study_name, storage_path, n_trials, n_workers, pruner)
+    else:
+        study.optimize(objective, n_trials=n_trials)
+    return study
+
+
+def _multi_fidelity_optimize(objective: _Objective, n_trials: int, n_workers: int, pruner: str,
+                             enqueue: list = None, study_name: str = None) -> tuple:
+    """
+    Successive halving over nested data subsamples (FIDELITY_RUNGS). Returns (studies, rungs):
+    one study per rung, the last one on the full data, and what each rung evaluated.
+    `enqueue` seeds the first rung; a `study_name` stores the rungs as "<name>_f<fraction>".
+    """
+    X, y = objective.X, objective.y
+    fractions = fidelity_fractions(len(y))
+    studies, rungs = [], []
+    started = datetime.now()
+    for level, fraction in enumerate(fractions):
+        if fraction < 1.0:
+            idx = fidelity_indices(y, fraction, objective.is_classification)
+            rung_X, rung_y = _take(X, idx), _take(y, idx)
+        else:
+            rung_X, rung_y = X, y
+        fidelity = {"rung": level, "fraction": fraction, "rows": int(len(rung_y))}
+        rung_objective = _Objective(rung_X, rung_y, objective.config, objective.is_classification, objective.metric,
+                                    objective.categorical, objective.threads, fidelity)
+        # Later rungs run exactly the promoted sets they have not scored yet (a resumed study may hold some)
+        candidates = None if level == 0 else enqueue
+        study = _optimize(rung_objective, n_trials if level == 0 else None, n_workers, pruner, enqueue,
+                          _rung_study_name(study_name, fraction) if study_name else None)
+        studies.append(study)
+        if candidates is None:
+            completed = len(_trials_since(study, started, optuna.trial.TrialState.COMPLETE))
+        else:
+            completed = len(_completed_params(study) & {_params_key(params) for params in candidates})
+        rungs.append(dict(fidelity, trials=n_trials if level == 0 else len(candidates), completed=completed,
+                          best_value=study.best_value if completed else None))
+        # Only the candidates of this rung compete for the next one
+        enqueue = _promoted(study, max(1, int(np.ceil(completed * PROMOTE_FRACTION))), candidates)
+        if not enqueue:
+            break
+    return studies, rungs
+
+
+def fidelity_fractions(n_rows: int) -> list:
+    """
+    Subsample fractions of the multi-fidelity rungs for a table of `n_rows` rows; the last is the full data.
+    """
+    return [f for f in FIDELITY_RUNGS if 0 < f < 1 and f * n_rows >= MIN_FIDELITY_ROWS] + [1.0]
+
+
+def _fidelity_key(fidelity: dict) -> tuple:
+    # What a score depends on: the subsample, not the rung it was evaluated at
+    return (fidelity["fraction"], fidelity["rows"]) if fidelity else (1.0, None)
+
+
+def _rung_study_name(study_name: str, fraction: float) -> str:
+    # Rung studies are named by their subsample: a study only ever holds scores on one fraction
+    return f"{study_name}_f{fraction:g}"
+
+
+def _digest(*parts) -> str:
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Content hash of a frame (values, columns and dtypes), for callers without a file fingerprint.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(json.dumps([list(map(str, df.columns)), df.dtypes.astype(str).tolist()]).encode())
+    hasher.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return hasher.hexdigest()
+
+
+def _warm_start_params(space_key: str, study_name: str) -> list:
+    """
+    Best parameter sets of the latest stored study over the same search space (another
+    dataset, e.g. an earlier version of this one), to enqueue in a new study. Empty when
+    the study already exists: it is resumed instead.
+    """
+    if WARM_START_TRIALS <= 0:
+        return []
+    storage = _journal_storage(_storage_path())
+    summaries = optuna.get_all_study_summaries(storage, include_best_trial=False)
+    if any(summary.study_name == study_name for summary in summaries):
+        return []
+    previous = [summary for summary in summaries
+                if summary.user_attrs.get("space_key") == space_key and summary.datetime_start is not None]
+    if not previous:
+        return []
+    latest = max(previous, key=lambda summary: summary.datetime_start)
+    return _promoted(optuna.load_study(study_name=latest.study_name, storage=storage), WARM_START_TRIALS)
+
+
 class ModelTrainer:
     def __init__(self, experiment_name: str = "flowforge_experiment"):
         mlflow.set_experiment(experiment_name)
         
-    def get_model_class(self, model_type: str, is_classification: bool):
-        if model_type == 'xgboost':
-            return XGBClassifier if is_classification else XGBRegressor
-        elif model_type == 'lightgbm':
-            return LGBMClassifier if is_classification else LGBMRegressor
-        elif model_type == 'random_forest':
-            return RandomForestClassifier if is_classification else RandomForestRegressor
-        elif model_type == 'logistic_regression':
-            return LogisticRegression if is_classification else LinearRegression
-        else:
-            raise ValueError(f"Unknown model type: {model_type}")
+    @staticmethod
+    def get_model_class(model_type: str, is_classification: bool):
+        return _model_class(model_type, is_classification)
 
-    def run_optuna_study(self, df: pd.DataFrame, target_col: str, problem_type: str, configs: list, metric: str, n_trials: int = 10):
+    def run_optuna_study(self, df: pd.DataFrame, target_col: str, problem_type: str, configs: list, metric: str, n_trials: int = 10, feature_pipeline: dict = None,
+                         n_workers: int = None, trial_threads: int = None, pruner: str = None,
+                         multi_fidelity: bool = None, dataset_key: str = None, persist: bool = None):
         """
         Runs an Optuna study for each model config.
+        A fitted feature pipeline (FeaturePipeline.to_dict()) is logged to every run as
+        feature_pipeline.json, so scoring data can be transformed like the training data.
+        With n_workers > 1 (default OPTUNA_N_WORKERS) the trials of each study run in a
+        process pool, each with `trial_threads` threads (default OPTUNA_TRIAL_THREADS, or the
+        cores divided among the workers).
+        Trials are scored fold by fold and stopped early by `pruner` (default OPTUNA_PRUNER);
+        completed / pruned counts and the time pruning saved are logged to the run.
+        With multi_fidelity (default: tables of at least OPTUNA_MULTI_FIDELITY_MIN_ROWS rows)
+        trials are screened on growing subsamples and only the best reach the full data
+        (see _multi_fidelity_optimize); the rungs are logged as fidelity.json.
+        Boosted models stop early on every fold (OPTUNA_EARLY_STOPPING_ROUNDS) and the final
+        model is refit with the best trial's mean best iteration.
+        With persist (default OPTUNA_PERSIST_STUDIES) each study is stored under the dataset
+        (`dataset_key`, e.g. the file fingerprint; default a hash of df), the model type and the
+        search space: running again resumes it, a new dataset is warm-started from the best
+        trials of the latest study over the same space.
         """
-        X = df.drop(columns=[target_col])
+        X_frame = df.drop(columns=[target_col])
         y = df[target_col]
+        categorical = len(X_frame.select_dtypes(include=["category"]).columns) > 0
+        X_sparse = None
+        n_workers = max(1, min(n_workers or OPTUNA_N_WORKERS, n_trials))
+        threads = trial_threads or OPTUNA_TRIAL_THREADS or max(1, CPU_COUNT // n_workers)
+        pruner = pruner or OPTUNA_PRUNER
+        if multi_fidelity is None:
+            multi_fidelity = len(df) >= MULTI_FIDELITY_MIN_ROWS
+        persist = OPTUNA_PERSIST_STUDIES if persist is None else persist
+        if persist and dataset_key is None:
+            dataset_key = frame_fingerprint(df)
         
         is_classification = problem_type.lower() == 'classification'
         best_run = None
         
         for config in configs:
             model_type = config['model_type']
+            if model_type in NATIVE_CATEGORICAL_MODELS:
+                X = X_frame
+            else:
+                if X_sparse is None:
+                    X_sparse = sparse_design(X_frame)
+                X = X_sparse
             
-            def objective(trial):
-                params = {}
-                for p in config['params']:
-                    if p['type'] == 'int':
-                        params[p['name']] = trial.suggest_int(p['name'], int(p['low']), int(p['high']))
-                    elif p['type'] == 'float':
-                        params[p['name']] = trial.suggest_float(p['name'], p['low'], p['high'])
-                    elif p['type'] == 'categorical':
-                        params[p['name']] = trial.suggest_categorical(p['name'], p['choices'])
-                
-                model_cls = self.get_model_class(model_type, is_classification)
-                
-                # Handle special params like verbosity
-                if model_type in ['xgboost', 'lightgbm']:
-                    params['verbosity'] = 0
-                
-                model = model_cls(**params)
-                
-                cv = StratifiedKFold(n_splits=3) if is_classification else KFold(n_splits=3)
-                
-                scoring = 'accuracy' if metric == 'accuracy' else 'neg_mean_squared_error'
-                if metric == 'f1': scoring = 'f1_macro'
-                
-                scores = cross_val_score(model, X, y, cv=cv, scoring=scoring)
-                return scores.mean()
-
-            direction = "maximize" if metric in ['accuracy', 'f1'] else "minimize" # MSE needs minimize, but sklearn returns neg_mse so maximize
+            objective = _Objective(X, y, config, is_classification, metric, categorical, threads)
             
-            study = optuna.create_study(direction=direction)
+            study_name, warm_start = None, []
+            if persist:
+                # Everything the scores depend on besides the dataset
+                fidelity = [fidelity_fractions(len(y)), PROMOTE_FRACTION] if multi_fidelity else None
+                space_key = _digest(model_type, config['params'], problem_type, metric, target_col, CV_FOLDS,
+                                    EARLY_STOPPING_ROUNDS, fidelity)
+                study_name = f"{model_type}_{_digest(dataset_key, space_key)}"
+                first_study = _rung_study_name(study_name, fidelity[0][0]) if multi_fidelity else study_name
+                warm_start = _warm_start_params(space_key, first_study)
+            started = datetime.now()
             
             # Integrate MLflow
             with mlflow.start_run(run_name=f"{model_type}_optuna"):
-                study.optimize(objective, n_trials=n_trials)
+                if multi_fidelity:
+                    studies, rungs = _multi_fidelity_optimize(objective, n_trials, n_workers, pruner, warm_start, study_name)
+                    mlflow.log_dict({"rungs": rungs, "promote_fraction": PROMOTE_FRACTION}, "fidelity.json")
+                else:
+                    studies = [_optimize(objective, n_trials, n_workers, pruner, warm_start, study_name)]
+                study = studies[-1] # Full-data results
+                if persist:
+                    for stored in studies:
+                        stored.set_user_attr("space_key", space_key)
+                        stored.set_user_attr("dataset_key", dataset_key)
+                    mlflow.set_tag("optuna_study", study.study_name)
+                    mlflow.log_param("warm_start_trials", len(warm_start))
                 
                 mlflow.log_params(study.best_params)
                 mlflow.log_metric(f"best_{metric}", study.best_value)
                 mlflow.set_tag("model_type", model_type)
+                mlflow.log_params({"optuna_workers": n_workers, "trial_threads": threads, "optuna_pruner": pruner,
+                                   "multi_fidelity": multi_fidelity})
+                stats = [pruning_stats(rung_study, started) for rung_study in studies]
+                mlflow.log_metrics({key: sum(stat[key] for stat in stats) for key in stats[0]})
+                if feature_pipeline is not None:
+                    mlflow.log_dict(feature_pipeline, "feature_pipeline.json")
                 
                 # Log best model
-                # Re-train on full data
+                # Re-train on full data, with every core
                 best_model_cls = self.get_model_class(model_type, is_classification)
-                best_model = best_model_cls(**study.best_params)
-                best_model.fit(X, y)
+                best_params = dict(study.best_params)
+                best_iterations = study.best_trial.user_attrs.get("best_iterations")
+                if best_iterations:
+                    # Early-stopped boosters: as many trees as the folds needed on average
+                    best_params['n_estimators'] = max(1, int(round(np.mean(best_iterations))))
+                    mlflow.log_param("refit_n_estimators", best_params['n_estimators'])
+                best_model = best_model_cls(**_model_params(model_type, best_params, categorical, CPU_COUNT))
+                if X is not X_frame:
+                    # Trained on sparse_design: logged with its encoder, so it scores DataFrames
+                    best_model = Pipeline([("encode", one_hot_encoder(X_frame)), ("model", best_model)])
+                    best_model.fit(X_frame, y)
+                else:
+                    best_model.fit(X, y)
                 
                 mlflow.sklearn.log_model(best_model, "model")
                 
@@ -0,0 +1,87 @@
+import pandas as pd
+from app.core.utils import dedup as dedup_index
+
+DEFAULT_CHUNK_ROWS = 250_000
+
+
+def _iter_raw_chunks(filepath: str, chunksize: int, columns: list = None, dtype: dict = None):
+    if filepath.endswith('.csv'):
+        with pd.read_csv(filepath, chunksize=chunksize, usecols=columns, dtype=dtype) as reader:
+            for chunk in reader:
+                yield chunk
+    else:
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(filepath)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+
+
+def iter_chunks(filepath: str, chunksize: int = DEFAULT_CHUNK_ROWS, columns: list = None, dedup: bool = True,
+                dtype: dict = None):
+    """
+    Yields the dataset as a sequence of DataFrames of at most `chunksize` rows.
+    CSV is parsed incrementally (with `dtype` per column if given, so every chunk is typed
+    alike); Parquet is read batch by batch through pyarrow.
+    Rows listed in the file's dedup index (see app.core.utils.dedup) are skipped unless dedup=False.
+    """
+    duplicate_rows = dedup_index.load_duplicate_rows(filepath) if dedup else None
+    offset = 0
+    for chunk in _iter_raw_chunks(filepath, chunksize, columns, dtype):
+        rows = len(chunk)
+        yield dedup_index.drop_duplicate_rows(chunk, duplicate_rows, offset)
+        offset += rows
+
+
+def read_head(filepath: str, n: int = 20, columns: list = None) -> pd.DataFrame:
+    """
+    Reads only the first `n` rows of a dataset.
+    """
+    for chunk in iter_chunks(filepath, chunksize=n, columns=columns):
+        return chunk.head(n)
+    return pd.DataFrame()
+
+
+def read_dataset(filepath: str, columns: list = None, dedup: bool = True, row_groups: list = None) -> pd.DataFrame:
+    """
+    Loads a full CSV or Parquet dataset into memory, without the rows
+    listed in its dedup index unless dedup=False.
+    `columns` limits the read to those columns; for Parquet, `row_groups` limits it
+    to those row groups (see app.core.utils.ingest for how uploads are laid out).
+    """
+    if row_groups is not None and not filepath.endswith('.csv'):
+        return _read_row_groups(filepath, row_groups, columns, dedup)
+    if filepath.endswith('.csv'):
+        df = pd.read_csv(filepath, usecols=columns)
+    else:
+        df = pd.read_parquet(filepath, columns=columns)
+    if dedup:
+        df = apply_dedup(df, filepath)
+    return df
+
+
+def _read_row_groups(filepath: str, row_groups: list, columns: list, dedup: bool) -> pd.DataFrame:
+    import numpy as np
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(filepath)
+    metadata = parquet_file.metadata
+    # Position of each row group's first row in the file, to apply the dedup index
+    starts = np.cumsum([0] + [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)])
+    duplicate_rows = dedup_index.load_duplicate_rows(filepath) if dedup else None
+    frames = []
+    for i in row_groups:
+        chunk = parquet_file.read_row_group(i, columns=columns).to_pandas()
+        frames.append(dedup_index.drop_duplicate_rows(chunk, duplicate_rows, int(starts[i])))
+    if not frames:
+        empty = parquet_file.schema_arrow.empty_table()
+        return (empty.select(columns) if columns is not None else empty).to_pandas()
+    return pd.concat(frames, ignore_index=True)
+
+
+def apply_dedup(df: pd.DataFrame, filepath: str) -> pd.DataFrame:
+    """
+    Drops the rows of an in-memory copy of `filepath` that its dedup index marks as duplicates.
+    """
+    duplicate_rows = dedup_index.load_duplicate_rows(filepath)
+    if duplicate_rows is None or not len(duplicate_rows):
+        return df
+    return dedup_index.drop_duplicate_rows(df, duplicate_rows).reset_index(drop=True)
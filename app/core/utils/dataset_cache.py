@@ -0,0 +1,136 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from app.core.utils import dedup, memory_profile
+from app.core.utils.data_io import read_dataset
+
+# Process-wide cache of loaded datasets shared by every router and the training flow.
+# Entries are keyed by path + size + mtime (of the file and of its dedup index), so a
+# rewritten file is never served stale. The cache is bounded by a memory budget with
+# LRU eviction and hands out copies, so callers cannot corrupt cached data: cheap views
+# when pandas Copy-on-Write is on (opt-in at app startup, PANDAS_COPY_ON_WRITE=1; default
+# from pandas 3.0 on), deep copies otherwise.
+
+CACHE_MEMORY_MB = float(os.getenv("DATASET_CACHE_MB", "4096"))
+
+
+def _handout(df: pd.DataFrame) -> pd.DataFrame:
+    # Under Copy-on-Write a shallow copy copies the shared buffers on first write
+    return df.copy(deep=not pd.get_option("mode.copy_on_write"))
+
+
+def _file_version(path: str):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DatasetCache:
+    def __init__(self, memory_budget_mb: float = CACHE_MEMORY_MB):
+        self.budget_bytes = memory_budget_mb * 1024 * 1024
+        self._entries = OrderedDict() # key -> (frame, nbytes)
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, filepath: str, columns, dedup_rows: bool, row_groups=None, profile: str = "default"):
+        return (
+            os.path.abspath(filepath),
+            _file_version(filepath),
+            _file_version(dedup.index_path(filepath)) if dedup_rows else None,
+            tuple(columns) if columns is not None else None,
+            dedup_rows,
+            tuple(row_groups) if row_groups is not None else None,
+            profile
+        )
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        return None
+
+    def get(self, filepath: str, columns: list = None, dedup_rows: bool = True, row_groups: list = None,
+            profile: str = None) -> pd.DataFrame:
+        """
+        Returns the dataset (optionally only `columns` / Parquet `row_groups`) as a
+        copy of the cached frame (a copy-on-write view when Copy-on-Write is enabled).
+        A column subset is served from a cached frame with all columns when one exists.
+        `profile` is a load profile from memory_profile.LOAD_PROFILES (default: DATASET_LOAD_PROFILE).
+        """
+        profile = profile or memory_profile.LOAD_PROFILE
+        key = self._key(filepath, columns, dedup_rows, row_groups, profile)
+        df = self._lookup(key)
+        if df is None and columns is not None:
+            full = self._lookup(self._key(filepath, None, dedup_rows, row_groups, profile))
+            if full is not None:
+                return _handout(full[list(columns)])
+        if df is not None:
+            return _handout(df)
+
+        with self._lock:
+            self.misses += 1
+        df = read_dataset(filepath, columns=columns, dedup=dedup_rows, row_groups=row_groups)
+        if profile == "compact":
+            # Only frames with every row may choose dtypes for the whole file
+            df = memory_profile.apply_compact_profile(filepath, df, persist=row_groups is None)
+        self._insert(key, df)
+        return _handout(df)
+
+    def _insert(self, key, df: pd.DataFrame):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.budget_bytes:
+            return # Larger than the whole budget: serve it uncached
+        with self._lock:
+            # Drop older versions of the same file/projection
+            for old_key in [k for k in self._entries if k[0] == key[0] and k[3:] == key[3:] and k != key]:
+                self._evict(old_key)
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (df, nbytes)
+            self._used_bytes += nbytes
+            while self._used_bytes > self.budget_bytes and self._entries:
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, key):
+        _, nbytes = self._entries.pop(key)
+        self._used_bytes -= nbytes
+
+    def invalidate(self, filepath: str = None):
+        """
+        Drops every cached entry of `filepath` (or everything).
+        """
+        with self._lock:
+            path = os.path.abspath(filepath) if filepath else None
+            for key in [k for k in self._entries if path is None or k[0] == path]:
+                self._evict(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "used_mb": round(self._used_bytes / 1024 / 1024, 2),
+                "budget_mb": round(self.budget_bytes / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+dataset_cache = DatasetCache()
+
+
+def load_dataset(filepath: str, columns: list = None, dedup_rows: bool = True, row_groups: list = None,
+                 profile: str = None) -> pd.DataFrame:
+    """
+    Shared, cached replacement for pd.read_csv / pd.read_parquet on the data directory.
+    Pass `columns` (and for Parquet `row_groups`) to read only what a step needs, and
+    profile="compact" for downcast / categorical dtypes (see app.core.utils.memory_profile).
+    """
+    return dataset_cache.get(filepath, columns=columns, dedup_rows=dedup_rows, row_groups=row_groups,
+                             profile=profile)
@@ -0,0 +1,182 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Row-hash duplicate detection that works across chunks.
+# Rows are reduced to 64-bit hashes; seen hashes are kept as sorted runs, LSM style:
+# every chunk adds a run, runs of similar size are merged (geometric sizes, so each hash
+# is merged O(log n) times), and the in-memory runs are spilled to disk as one
+# memory-mapped run once they exceed the memory budget.
+# The result is a sidecar index of duplicate row positions (`<file>.dedup.npz`) that
+# loaders apply lazily, so the source file is never rewritten.
+
+MEMORY_BUDGET_MB = float(os.getenv("DEDUP_MEMORY_MB", "512"))
+SPILL_DIR = os.getenv("DEDUP_SPILL_DIR", tempfile.gettempdir())
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Vectorized 64-bit hash of every row (values only, index ignored).
+    """
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _merge(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Disjoint sorted runs; the stable sort (timsort) merges two runs in linear time
+    return np.sort(np.concatenate([a, b]), kind="stable")
+
+
+class RowHashSet:
+    """
+    Set of 64-bit row hashes with a bounded in-memory part.
+    Collisions are possible in principle but negligible at 64 bits.
+    """
+    def __init__(self, memory_budget_mb: float = MEMORY_BUDGET_MB, spill_dir: str = SPILL_DIR):
+        self.budget_bytes = memory_budget_mb * 1024 * 1024
+        self.spill_dir = spill_dir
+        self._memory = [] # Sorted in-memory runs, sizes decreasing geometrically
+        self._runs = []
+        self._tmp_dir = None
+
+    def add(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Adds a chunk of row hashes. Returns a mask that is True for rows seen before,
+        either earlier in this chunk or in a previous one.
+        """
+        uniq, first_idx = np.unique(hashes, return_index=True)
+        seen = np.ones(len(hashes), dtype=bool)
+        seen[first_idx] = False
+
+        present = self._contains(uniq)
+        seen[first_idx[present]] = True
+
+        new = uniq[~present]
+        if len(new):
+            self._memory.append(new)
+            # Merge while the newest run is at least half the size of the one before it
+            while len(self._memory) > 1 and 2 * len(self._memory[-1]) >= len(self._memory[-2]):
+                last = self._memory.pop()
+                self._memory[-1] = _merge(self._memory[-1], last)
+        if sum(run.nbytes for run in self._memory) > self.budget_bytes:
+            self._spill()
+        return seen
+
+    def _contains(self, sorted_hashes: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(sorted_hashes), dtype=bool)
+        for run in self._memory + self._runs:
+            if not len(run):
+                continue
+            pos = np.searchsorted(run, sorted_hashes)
+            in_range = pos < len(run)
+            found[in_range] |= run[pos[in_range]] == sorted_hashes[in_range]
+        return found
+
+    def _spill(self):
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix="dedup_", dir=self.spill_dir)
+        run_path = os.path.join(self._tmp_dir, f"run_{len(self._runs)}.bin")
+        run = self._memory[0]
+        for other in self._memory[1:]:
+            run = _merge(run, other)
+        run.tofile(run_path)
+        self._runs.append(np.memmap(run_path, dtype=np.uint64, mode="r"))
+        self._memory = []
+
+    def close(self):
+        self._runs = []
+        if self._tmp_dir:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def index_path(filepath: str) -> str:
+    return f"{filepath}.dedup.npz"
+
+
+def find_duplicate_rows(chunks) -> tuple:
+    """
+    Scans an iterable of DataFrame chunks (in file order).
+    Returns (total_rows, positions of duplicate rows as a sorted int64 array).
+    """
+    total_rows = 0
+    duplicate_rows = []
+    with RowHashSet() as seen:
+        for chunk in chunks:
+            mask = seen.add(row_hashes(chunk))
+            duplicate_rows.append(np.flatnonzero(mask) + total_rows)
+            total_rows += len(chunk)
+    positions = np.concatenate(duplicate_rows) if duplicate_rows else np.empty(0, dtype=np.int64)
+    return total_rows, positions.astype(np.int64)
+
+
+def ensure_dedup_index(filepath: str, df: pd.DataFrame = None, chunksize: int = None) -> dict:
+    """
+    Builds the duplicate-row index for `filepath` unless a valid one exists.
+    When the full (un-deduplicated) frame is already in memory, pass it as `df`
+    to avoid a second read of the file.
+    Returns {"rows": rows in the source file, "duplicates": duplicate rows}.
+    """
+    index = _load_index(filepath)
+    if index is not None:
+        return {"rows": int(index["rows"]), "duplicates": int(len(index["duplicate_rows"]))}
+
+    if df is not None:
+        step = chunksize or 1_000_000
+        chunks = (df.iloc[start:start + step] for start in range(0, len(df), step))
+    else:
+        from app.core.utils.data_io import iter_chunks, DEFAULT_CHUNK_ROWS
+        chunks = iter_chunks(filepath, chunksize=chunksize or DEFAULT_CHUNK_ROWS, dedup=False)
+    rows, duplicate_rows = find_duplicate_rows(chunks)
+
+    stat = os.stat(filepath)
+    tmp_path = f"{index_path(filepath)}.tmp.npz"
+    np.savez(tmp_path, duplicate_rows=duplicate_rows,
+             source=np.array([stat.st_size, stat.st_mtime_ns, rows], dtype=np.int64))
+    os.replace(tmp_path, index_path(filepath))
+    return {"rows": int(rows), "duplicates": int(len(duplicate_rows))}
+
+
+def _load_index(filepath: str):
+    path = index_path(filepath)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            size, mtime_ns, rows = data["source"].tolist()
+            duplicate_rows = data["duplicate_rows"]
+    except (OSError, ValueError, KeyError):
+        return None
+    stat = os.stat(filepath)
+    if size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+        return None # Source changed since the index was built
+    return {"rows": rows, "duplicate_rows": duplicate_rows}
+
+
+def load_duplicate_rows(filepath: str):
+    """
+    Returns the sorted positions of duplicate rows for the current file content, or None.
+    """
+    index = _load_index(filepath)
+    return index["duplicate_rows"] if index is not None else None
+
+
+def drop_duplicate_rows(df: pd.DataFrame, duplicate_rows: np.ndarray, offset: int = 0) -> pd.DataFrame:
+    """
+    Removes duplicate rows from a frame (or a chunk starting at row `offset` of the file).
+    """
+    if duplicate_rows is None or not len(duplicate_rows):
+        return df
+    lo, hi = np.searchsorted(duplicate_rows, [offset, offset + len(df)])
+    if lo == hi:
+        return df
+    keep = np.ones(len(df), dtype=bool)
+    keep[duplicate_rows[lo:hi] - offset] = False
+    return df[keep]
@@ -0,0 +1,200 @@
+import json
+import os
+import shutil
+import pandas as pd
+from app.core.utils.data_io import DEFAULT_CHUNK_ROWS, read_head
+
+# Ingestion stage for uploaded datasets.
+# CSV uploads are converted once into a columnar Parquet file whose row groups match the
+# chunk size used by the loaders, so later steps read only the columns and row groups they
+# need instead of re-parsing text. The schema is stored next to the file
+# (`<file>.schema.json`) and can be read without opening the data.
+
+ROW_GROUP_ROWS = int(os.getenv("PARQUET_ROW_GROUP_ROWS", str(DEFAULT_CHUNK_ROWS)))
+CONVERT_UPLOADS = os.getenv("INGEST_CONVERT_TO_PARQUET", "true").lower() == "true"
+RAW_DIR_NAME = "raw" # Original uploads are kept under <data dir>/raw
+
+
+def schema_path(filepath: str) -> str:
+    return f"{filepath}.schema.json"
+
+
+_ARROW_TYPES = {"bool": "bool_", "int64": "int64", "float64": "float64", "str": "string"}
+
+
+def csv_dtypes(src_path: str, chunksize: int) -> dict:
+    """
+    First pass over a CSV: per-column dtype that holds every chunk
+    (int + float -> float, anything mixed with text -> string).
+    """
+    kinds = {col: set() for col in pd.read_csv(src_path, nrows=0).columns}
+    with pd.read_csv(src_path, chunksize=chunksize) as reader:
+        for chunk in reader:
+            for col, dtype in chunk.dtypes.items():
+                if chunk[col].isnull().all():
+                    kinds[col].add("null") # All-missing in this chunk: rules out int/bool
+                else:
+                    kinds[col].add(dtype.kind if dtype.kind in "biuf" else "O")
+
+    dtypes = {}
+    for col, seen in kinds.items():
+        if "null" in seen and seen <= {"null", "i", "u", "f"}: # Like pandas, all-missing columns are float
+            dtypes[col] = "float64"
+        elif seen and seen <= {"b"}:
+            dtypes[col] = "bool"
+        elif seen and seen <= {"i", "u"}:
+            dtypes[col] = "int64"
+        elif seen and seen <= {"i", "u", "f"}:
+            dtypes[col] = "float64"
+        else:
+            dtypes[col] = "str"
+    return dtypes
+
+
+def convert_csv_to_parquet(src_path: str, dest_path: str, row_group_rows: int = ROW_GROUP_ROWS) -> str:
+    """
+    Streams a CSV into a Parquet file with `row_group_rows` rows per row group.
+    Two chunked passes: the first fixes a dtype per column, the second writes.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    dtypes = csv_dtypes(src_path, row_group_rows)
+    schema = pa.schema([(col, getattr(pa, _ARROW_TYPES[dtype])()) for col, dtype in dtypes.items()])
+    tmp_path = f"{dest_path}.tmp"
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        with pd.read_csv(src_path, chunksize=row_group_rows, dtype=dtypes) as reader:
+            for chunk in reader:
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False),
+                                   row_group_size=row_group_rows)
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def _rewrite_row_groups(filepath: str, row_group_rows: int = ROW_GROUP_ROWS) -> bool:
+    """
+    Re-chunks an uploaded Parquet file whose row groups are far larger than `row_group_rows`
+    (e.g. written as a single group), so loaders can prune row groups. Returns True if rewritten.
+    """
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(filepath)
+    metadata = parquet_file.metadata
+    largest = max((metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)), default=0)
+    if largest <= 2 * row_group_rows:
+        return False
+    tmp_path = f"{filepath}.tmp"
+    with pq.ParquetWriter(tmp_path, parquet_file.schema_arrow) as writer:
+        for batch in parquet_file.iter_batches(batch_size=row_group_rows):
+            writer.write_batch(batch, row_group_size=row_group_rows)
+    os.replace(tmp_path, filepath)
+    return True
+
+
+def write_schema(filepath: str, source_fingerprint: str = None) -> dict:
+    """
+    Stores the schema of a Parquet file in its sidecar, from the file footer only.
+    `source_fingerprint` is the content hash of the upload the file was built from.
+    """
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(filepath)
+    metadata = parquet_file.metadata
+    arrow_schema = parquet_file.schema_arrow
+    pandas_dtypes = arrow_schema.empty_table().to_pandas().dtypes
+    stat = os.stat(filepath)
+    schema = {
+        "columns": [field.name for field in arrow_schema],
+        "arrow_types": {field.name: str(field.type) for field in arrow_schema},
+        "column_types": {col: str(dtype) for col, dtype in pandas_dtypes.items()},
+        "rows": metadata.num_rows,
+        "row_groups": [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)],
+        "source": [stat.st_size, stat.st_mtime_ns],
+        "source_fingerprint": source_fingerprint
+    }
+    with open(f"{schema_path(filepath)}.tmp", "w") as f:
+        json.dump(schema, f)
+    os.replace(f"{schema_path(filepath)}.tmp", schema_path(filepath))
+    return schema
+
+
+def read_schema(filepath: str) -> dict:
+    """
+    Returns {"columns", "column_types", "rows", ...} without loading the data.
+    Parquet schemas come from the sidecar (rebuilt from the footer if stale);
+    for CSV only the header and the dtypes of the first rows are available ("rows" is None).
+    """
+    if not filepath.endswith('.csv'):
+        path = schema_path(filepath)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                schema = json.load(f)
+            stat = os.stat(filepath)
+            if schema.get("source") == [stat.st_size, stat.st_mtime_ns]:
+                return schema
+        return write_schema(filepath)
+    head = read_head(filepath, 100)
+    return {
+        "columns": head.columns.tolist(),
+        "column_types": {col: str(dtype) for col, dtype in head.dtypes.items()},
+        "rows": None
+    }
+
+
+def _already_ingested(dest_path: str, fingerprint: str) -> bool:
+    # Same upload content as the one the existing Parquet file was built from
+    if fingerprint is None or not os.path.exists(dest_path) or not os.path.exists(schema_path(dest_path)):
+        return False
+    schema = read_schema(dest_path)
+    return schema.get("source_fingerprint") == fingerprint
+
+
+def ingest_upload(filepath: str, fingerprint: str = None) -> str:
+    """
+    Prepares an uploaded file for the rest of the pipeline and returns the path to use from now on.
+    CSV becomes `<name>.parquet` (the original is moved to the raw/ folder next to it);
+    Parquet is re-chunked if its row groups are too large. Falls back to the upload as-is
+    if the conversion fails.
+    `fingerprint` is the content hash computed while the upload arrived: it is registered
+    for the uploaded file, and a re-upload of identical content skips the conversion.
+    """
+    from app.core.ml import summary_store
+    if fingerprint is not None:
+        summary_store.register_fingerprint(filepath, fingerprint)
+    if not CONVERT_UPLOADS:
+        return filepath
+    try:
+        if filepath.endswith('.csv'):
+            dest_path = f"{os.path.splitext(filepath)[0]}.parquet"
+            converted = _already_ingested(dest_path, fingerprint)
+            if not converted:
+                convert_csv_to_parquet(filepath, dest_path)
+            raw_dir = os.path.join(os.path.dirname(filepath), RAW_DIR_NAME)
+            raw_path = os.path.join(raw_dir, os.path.basename(filepath))
+            os.makedirs(raw_dir, exist_ok=True)
+            shutil.move(filepath, raw_path)
+            if fingerprint is not None:
+                summary_store.register_fingerprint(raw_path, fingerprint)
+            filepath = dest_path
+            if converted:
+                return filepath
+        else:
+            _rewrite_row_groups(filepath)
+        write_schema(filepath, source_fingerprint=fingerprint)
+    except Exception as e:
+        print(f"Error converting {filepath} to Parquet: {e}")
+    return filepath
+
+
+def estimate_rows(filepath: str) -> int:
+    """
+    Row count without reading the data: exact for Parquet (footer), estimated for CSV
+    from the file size and the average length of the first lines.
+    """
+    if not filepath.endswith('.csv'):
+        return int(read_schema(filepath)["rows"])
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        f.readline() # Header
+        head = f.read(1024 * 1024)
+    lines = head.count(b"\n")
+    if lines == 0:
+        return 1 if head.strip() else 0
+    return int(size / (len(head) / lines))
@@ -0,0 +1,101 @@
+import os
+import pandas as pd
+from app.core.utils import ingest
+from app.core.utils.data_io import read_head, DEFAULT_CHUNK_ROWS
+from app.core.utils.dataset_cache import load_dataset
+
+# Memory-budget planner in front of every data load.
+# The in-memory size of a dataset is estimated from its row count (Parquet footer, or
+# file size for CSV) and the measured size of a few sample rows, then the cheapest
+# execution mode that fits the budget is chosen among the ones the step supports:
+#   in_memory        - the whole dataset (or the requested columns) as one frame
+#   column_projected - only the requested columns, when the whole file would not fit
+#   sampled          - a random sample as large as the budget allows
+#   chunked          - out-of-core, chunk by chunk
+
+MODES = ["in_memory", "column_projected", "sampled", "chunked"]
+SAMPLE_ROWS = 1000
+# Peak memory per loaded byte while a step runs (copies, intermediate frames)
+WORKING_SET_FACTOR = float(os.getenv("LOAD_WORKING_SET_FACTOR", "2.0"))
+
+
+def _default_budget_mb() -> float:
+    # Half of the container / machine memory
+    try:
+        with open("/sys/fs/cgroup/memory.max", "r") as f:
+            limit = f.read().strip()
+        if limit != "max":
+            return int(limit) / 1024 / 1024 / 2
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 / 1024 / 2
+    except (ValueError, OSError, AttributeError):
+        return 4096.0
+
+
+MEMORY_BUDGET_MB = float(os.getenv("LOAD_MEMORY_BUDGET_MB", "0")) or _default_budget_mb()
+
+
+def estimate_memory(filepath: str, columns: list = None) -> dict:
+    """
+    Estimated in-memory size of the dataset (or of `columns`) as a DataFrame.
+    Returns {"rows", "bytes_per_row", "estimated_mb"}.
+    """
+    rows = ingest.estimate_rows(filepath)
+    head = read_head(filepath, SAMPLE_ROWS, columns=columns)
+    bytes_per_row = head.memory_usage(deep=True, index=False).sum() / len(head) if len(head) else 0.0
+    return {
+        "rows": int(rows),
+        "bytes_per_row": float(bytes_per_row),
+        "estimated_mb": round(rows * bytes_per_row / 1024 / 1024, 2)
+    }
+
+
+def plan_load(filepath: str, columns: list = None, allowed: list = None, budget_mb: float = None) -> dict:
+    """
+    Chooses how a step should load `filepath`: the first mode (in MODES order) among
+    `allowed` whose working set fits `budget_mb` (default LOAD_MEMORY_BUDGET_MB).
+    `columns` are the columns the step needs (None: all of them).
+    Returns {"mode", "estimated_mb", "budget_mb", "rows", "columns", ...}; "mode" is None
+    when no allowed mode fits.
+    """
+    allowed = allowed or MODES
+    budget_mb = budget_mb or MEMORY_BUDGET_MB
+    full = estimate_memory(filepath)
+    needed = estimate_memory(filepath, columns) if columns is not None else full
+    plan = {
+        "mode": None,
+        "estimated_mb": full["estimated_mb"],
+        "budget_mb": round(budget_mb, 2),
+        "rows": full["rows"],
+        "columns": columns
+    }
+    fits = lambda estimate: estimate["estimated_mb"] * WORKING_SET_FACTOR <= budget_mb
+
+    if "in_memory" in allowed and fits(full):
+        plan["mode"] = "in_memory"
+    elif "column_projected" in allowed and columns is not None and fits(needed):
+        plan.update(mode="column_projected", projected_mb=needed["estimated_mb"])
+    elif "sampled" in allowed and needed["bytes_per_row"] > 0:
+        # The sampler holds the sample plus the chunk being merged into it (see sampling.sample_dataset)
+        rows = int(budget_mb * 1024 * 1024 / WORKING_SET_FACTOR / needed["bytes_per_row"]) - DEFAULT_CHUNK_ROWS
+        plan.update(mode="sampled", sample_rows=max(1, min(rows, full["rows"])))
+    elif "chunked" in allowed:
+        rows = int(budget_mb * 1024 * 1024 / WORKING_SET_FACTOR / max(needed["bytes_per_row"], 1.0))
+        plan.update(mode="chunked", chunk_rows=max(1, min(rows, DEFAULT_CHUNK_ROWS)))
+    return plan
+
+
+def load_planned(filepath: str, plan: dict, target_col: str = None) -> pd.DataFrame:
+    """
+    Loads the frame for an in_memory, column_projected or sampled plan
+    (a sampled plan is stratified by `target_col` if given).
+    """
+    if plan["mode"] in ("in_memory", "column_projected"):
+        return load_dataset(filepath, columns=plan["columns"])
+    if plan["mode"] == "sampled":
+        from app.core.ml import sampling
+        sample, _ = sampling.sample_dataset(filepath, plan["sample_rows"], target_col=target_col, columns=plan["columns"])
+        return sample
+    raise ValueError(f"Plan mode {plan['mode']} does not load a single frame")
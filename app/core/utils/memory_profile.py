@@ -0,0 +1,130 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Compact load profile: smaller dtypes for frames loaded through the shared cache.
+# Integers are downcast to the smallest type that holds their range, floats to float32
+# only where that is lossless, and string columns become `category` (low cardinality)
+# or Arrow-backed strings. The chosen dtype map is stored next to the dataset
+# (`<file>.dtypes.json`, with the memory saved per column) so every later load of the
+# same file version uses the same schema.
+
+LOAD_PROFILE = os.getenv("DATASET_LOAD_PROFILE", "default") # "compact" to opt in
+LOAD_PROFILES = ["default", "compact"]
+CATEGORY_MAX_RATIO = float(os.getenv("COMPACT_CATEGORY_MAX_RATIO", "0.5"))
+
+
+def dtypes_path(filepath: str) -> str:
+    return f"{filepath}.dtypes.json"
+
+
+def compact_dtype(series: pd.Series):
+    """
+    Returns the smallest safe dtype for a column (as a string), or None to keep it as is.
+    """
+    kind = series.dtype.kind
+    if kind in "iu":
+        if series.empty:
+            return None
+        # Signed only: unsigned columns would wrap around in later arithmetic (e.g. x - 1)
+        downcast = pd.to_numeric(series, downcast="integer")
+        return str(downcast.dtype) if downcast.dtype != series.dtype else None
+    if kind == "f" and series.dtype != np.float32:
+        values = series.to_numpy()
+        with np.errstate(over="ignore"):
+            lossless = np.array_equal(values.astype(np.float32).astype(values.dtype), values, equal_nan=True)
+        return "float32" if lossless else None
+    if series.dtype == object:
+        if pd.api.types.infer_dtype(series, skipna=True) != "string":
+            return None # Mixed or non-string objects are left alone
+        count = int(series.notnull().sum())
+        if count and series.nunique() / count <= CATEGORY_MAX_RATIO:
+            return "category"
+        return "string[pyarrow]"
+    return None
+
+
+def compact_frame(df: pd.DataFrame) -> tuple:
+    """
+    Returns (compacted frame, dtype map, report) where report maps every converted column
+    to {"from", "to", "bytes_before", "bytes_after", "saved_bytes"}.
+    """
+    dtype_map = {}
+    for col in df.columns:
+        dtype = compact_dtype(df[col])
+        if dtype is not None:
+            dtype_map[col] = dtype
+    if not dtype_map:
+        return df, {}, {}
+
+    before = df[list(dtype_map)].memory_usage(deep=True, index=False)
+    compact = df.astype(dtype_map)
+    after = compact[list(dtype_map)].memory_usage(deep=True, index=False)
+    report = {
+        col: {
+            "from": str(df[col].dtype),
+            "to": dtype,
+            "bytes_before": int(before[col]),
+            "bytes_after": int(after[col]),
+            "saved_bytes": int(before[col] - after[col])
+        }
+        for col, dtype in dtype_map.items()
+    }
+    return compact, dtype_map, report
+
+
+def load_profile(filepath: str) -> dict:
+    """
+    Returns the stored {"dtypes", "report", "saved_bytes"} for the current file content, or None.
+    """
+    path = dtypes_path(filepath)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        profile = json.load(f)
+    stat = os.stat(filepath)
+    if profile.get("source") != [stat.st_size, stat.st_mtime_ns]:
+        return None # Source changed since the dtypes were chosen
+    return profile
+
+
+def _save_profile(filepath: str, dtypes: dict, report: dict):
+    stat = os.stat(filepath)
+    profile = {
+        "source": [stat.st_size, stat.st_mtime_ns],
+        "dtypes": dtypes,
+        "report": report,
+        "saved_bytes": sum(entry["saved_bytes"] for entry in report.values())
+    }
+    tmp_path = f"{dtypes_path(filepath)}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(profile, f)
+    os.replace(tmp_path, dtypes_path(filepath))
+
+
+def apply_compact_profile(filepath: str, df: pd.DataFrame, persist: bool = True) -> pd.DataFrame:
+    """
+    Converts a frame loaded from `filepath` to the file's stored compact dtypes.
+    Columns without a stored decision are profiled now and, if `persist` (i.e. `df` holds
+    every row of the file), added to the stored map.
+    """
+    profile = load_profile(filepath) or {"dtypes": {}, "report": {}}
+    known = {col: dtype for col, dtype in profile["dtypes"].items() if col in df.columns}
+    if known:
+        df = df.astype(known)
+
+    new_cols = [col for col in df.columns if col not in profile["dtypes"] and col not in profile["report"]]
+    if not new_cols or not persist:
+        return df
+    compact, dtype_map, report = compact_frame(df[new_cols])
+    if dtype_map:
+        df = df.assign(**{col: compact[col] for col in dtype_map})
+    # Columns that keep their dtype are recorded too, so they are not profiled again
+    for col in new_cols:
+        if col not in dtype_map:
+            nbytes = int(df[col].memory_usage(deep=True, index=False))
+            report[col] = {"from": str(df[col].dtype), "to": None, "bytes_before": nbytes,
+                           "bytes_after": nbytes, "saved_bytes": 0}
+    _save_profile(filepath, {**profile["dtypes"], **dtype_map}, {**profile["report"], **report})
+    return df
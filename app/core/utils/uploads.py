@@ -0,0 +1,181 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import uuid
+import pandas as pd
+from datetime import datetime
+
+# Chunked, resumable uploads.
+# An upload is a session with a `.part` file and a JSON state file under UPLOAD_DIR.
+# Every part is appended at an explicit byte offset, so a client that lost its connection
+# asks for the current offset and continues from there. The file is hashed while it
+# arrives (same blake2b digest as summary_store.dataset_fingerprint) and its schema is
+# sniffed from the first bytes, so a bad file is rejected before the rest is sent.
+
+UPLOAD_DIR = "app/data/.uploads"
+CHUNK_BYTES = int(float(os.getenv("UPLOAD_CHUNK_MB", "8")) * 1024 * 1024)
+SNIFF_BYTES = 1024 * 1024
+SUPPORTED_EXTENSIONS = ('.csv', '.parquet')
+
+_hashers = {} # upload_id -> running blake2b of the bytes received so far
+_lock = threading.Lock()
+
+
+def _state_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.json")
+
+
+def _part_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+
+def _save_state(state: dict):
+    state["updated_at"] = datetime.now().isoformat()
+    tmp_path = f"{_state_path(state['upload_id'])}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, _state_path(state["upload_id"]))
+
+
+def get_upload(upload_id: str) -> dict:
+    """
+    Returns {"upload_id", "filename", "received", "total_size", "schema", ...} or None.
+    """
+    path = _state_path(upload_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def start_upload(filename: str, total_size: int = None) -> dict:
+    filename = os.path.basename(filename)
+    if not filename.endswith(SUPPORTED_EXTENSIONS):
+        raise ValueError("Unsupported file format. Please upload CSV or Parquet.")
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    open(_part_path(upload_id), "wb").close()
+    _hashers[upload_id] = hashlib.blake2b(digest_size=16)
+    state = {
+        "upload_id": upload_id,
+        "filename": filename,
+        "total_size": total_size,
+        "received": 0,
+        "chunk_size": CHUNK_BYTES,
+        "schema": None
+    }
+    _save_state(state)
+    return state
+
+
+def sniff_schema(head: bytes, filename: str) -> dict:
+    """
+    Infers columns and dtypes from the first bytes of an upload.
+    Raises ValueError if they cannot be a valid dataset.
+    Parquet keeps its schema in the footer, so only the magic bytes are checked.
+    """
+    if filename.endswith('.parquet'):
+        if len(head) >= 4 and head[:4] != b"PAR1":
+            raise ValueError("Not a Parquet file")
+        return None
+    complete = head[:head.rfind(b"\n") + 1] or head # Whole lines only
+    try:
+        sample = pd.read_csv(io.BytesIO(complete))
+    except Exception as e:
+        raise ValueError(f"Could not parse CSV: {e}")
+    if len(sample.columns) == 0:
+        raise ValueError("CSV has no columns")
+    return {
+        "columns": sample.columns.tolist(),
+        "column_types": {col: str(dtype) for col, dtype in sample.dtypes.items()},
+        "sample_rows": len(sample)
+    }
+
+
+def _hasher(upload_id: str, received: int):
+    hasher = _hashers.get(upload_id)
+    if hasher is None:
+        # Process restarted since the last part: rebuild the running hash from disk,
+        # over the received bytes only (a part interrupted mid-write may have left a tail)
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(_part_path(upload_id), "rb") as f:
+            remaining = received
+            while remaining > 0:
+                block = f.read(min(CHUNK_BYTES, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+        _hashers[upload_id] = hasher
+    return hasher
+
+
+def append_part(upload_id: str, offset: int, data: bytes) -> dict:
+    """
+    Writes `data` at byte `offset` of the upload. Offsets must be contiguous:
+    a part that does not start at the current size raises ValueError (ask get_upload for
+    the offset to resume from); a part that was already received is ignored.
+    """
+    with _lock:
+        state = get_upload(upload_id)
+        if state is None:
+            raise KeyError(f"Unknown upload: {upload_id}")
+        if offset + len(data) <= state["received"]:
+            return state # Retried part that already arrived
+        if offset != state["received"]:
+            raise ValueError(f"Expected offset {state['received']}, got {offset}")
+
+        hasher = _hasher(upload_id, state["received"])
+        with open(_part_path(upload_id), "r+b") as f:
+            f.seek(offset)
+            f.truncate() # Drop bytes of a part that was interrupted mid-write
+            f.write(data)
+        hasher.update(data)
+        state["received"] += len(data)
+
+        if state["schema"] is None and state["received"] >= SNIFF_BYTES:
+            _sniff(state)
+        _save_state(state)
+        return state
+
+
+def _sniff(state: dict):
+    with open(_part_path(state["upload_id"]), "rb") as f:
+        head = f.read(SNIFF_BYTES)
+    try:
+        state["schema"] = sniff_schema(head, state["filename"]) or {}
+    except ValueError:
+        abort_upload(state["upload_id"])
+        raise
+
+
+def complete_upload(upload_id: str, data_dir: str) -> dict:
+    """
+    Moves a fully received upload into `data_dir`.
+    Returns {"filepath", "fingerprint", "schema"} (schema as sniffed from the first bytes).
+    """
+    with _lock:
+        state = get_upload(upload_id)
+        if state is None:
+            raise KeyError(f"Unknown upload: {upload_id}")
+        if state["total_size"] is not None and state["received"] != state["total_size"]:
+            raise ValueError(f"Upload incomplete: {state['received']} of {state['total_size']} bytes received")
+        if state["schema"] is None:
+            _sniff(state) # Smaller than the sniffing window
+        fingerprint = _hasher(upload_id, state["received"]).hexdigest()
+
+        filepath = os.path.join(data_dir, state["filename"])
+        os.truncate(_part_path(upload_id), state["received"]) # Tail of an interrupted part
+        os.replace(_part_path(upload_id), filepath)
+        os.remove(_state_path(upload_id))
+        _hashers.pop(upload_id, None)
+        return {"filepath": filepath, "fingerprint": fingerprint, "schema": state["schema"]}
+
+
+def abort_upload(upload_id: str):
+    _hashers.pop(upload_id, None)
+    for path in [_part_path(upload_id), _state_path(upload_id)]:
+        if os.path.exists(path):
+            os.remove(path)
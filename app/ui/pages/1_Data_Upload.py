@@ -53,19 +53,16 @@ if uploaded_file is not None:
                 data = response.json()
                 filepath = data['filepath']
                 
-                # Read for Preview & Stats
+                # Preview from the first rows only; shape comes from the stored schema
                 uploaded_file.seek(0)
                 if uploaded_file.name.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file) # Read full to get shape? Might be slow for huge files. 
-                    # Optimization: Just read header for cols, and shape if separate metadata provided?
-                    # For this scale, reading it is fine or user 'head' logic.
-                    # Start with full read to get shape as requested.
+                    df_preview = pd.read_csv(uploaded_file, nrows=5)
                 else:
-                    df = pd.read_parquet(uploaded_file)
+                    import pyarrow.parquet as pq
+                    df_preview = next(pq.ParquetFile(uploaded_file).iter_batches(batch_size=5)).to_pandas()
                 
-                shape = df.shape
-                columns = df.columns.tolist()
-                df_preview = df.head(5)
+                columns = data['columns']
+                shape = (data.get('rows') or 0, len(columns))
                 
                 # DISPLAY SUCCESS WITH STATS
                 st.success(f"File '{data['filename']}' uploaded successfully! (Rows: {shape[0]}, Columns: {shape[1]})")
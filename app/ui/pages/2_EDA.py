@@ -5,7 +5,6 @@ import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 from app.ui.session_manager import log_event, save_page_state, get_page_state, get_current_session_id
-from app.api.routers.eda import DATA_DIR
 
 API_URL = os.getenv("API_BASE_URL", "http://backend:8000")
 
@@ -87,15 +86,37 @@ else:
         with st.expander("📊 Statistical Summary Tables (Cleaned Data)", expanded=False):
             
             # Duplicates Report
-            dupes = saved_stats.get("duplicates", 0)
+            dupes = saved_stats.get("duplicates") or 0 # None: not checked for sampled summaries
             orig_rows = saved_stats.get("rows_original", 0)
             if dupes > 0:
-                st.warning(f"⚠️ **{dupes}** duplicate rows were detected and **dropped**! (Original: {orig_rows}, Cleaned: {saved_stats.get('rows_cleaned')})")
+                st.warning(f"⚠️ **{dupes}** duplicate rows were detected and are **excluded** from all later steps (source file unchanged). (Original: {orig_rows}, Cleaned: {saved_stats.get('rows_cleaned')})")
             
-            # Excel Report Link
+            # Sampled summaries (very large tables): say how approximate the numbers are
+            sample_info = saved_stats.get("sampling")
+            if sample_info:
+                st.info(f"ℹ️ Statistics estimated from a {sample_info['fraction']:.2%} {sample_info['method']} sample "
+                        f"({sample_info['sample_rows']} of {sample_info['total_rows']} rows). Rows, missing values and "
+                        f"min/max are exact; run EDA in 'full' mode for exact statistics.")
+            
+            # Report Link (generated in the background by the backend)
             report_path = saved_stats.get("report_path")
-            if report_path and os.path.exists(report_path):
-                 st.success(f"📈 Detailed Excel Report generated: `{report_path}`")
+            report_id = saved_stats.get("report_id")
+            # The job status decides; the file check is for summaries saved without a job id
+            report_status = None
+            if report_id:
+                try:
+                    report = requests.get(f"{API_URL}/eda/report/{report_id}").json()
+                    report_status = report.get("status")
+                    if report_status == "failed":
+                        st.error(f"Report generation failed: {report.get('error')}")
+                    elif report_status in ("pending", "running"):
+                        st.info(f"⏳ Report is being generated ({report_status}): `{report_path}`")
+                        if st.button("Refresh Report Status"):
+                            st.rerun()
+                except Exception as e:
+                    st.warning(f"Could not fetch report status: {e}")
+            if report_status in (None, "done") and report_path and os.path.exists(report_path):
+                 st.success(f"📈 Detailed Report generated: `{report_path}`")
             
             # Display Tables nicely
             tabs = st.tabs(["Overview", "Missing Values", "Numerical Stats", "Categorical Stats", "Correlation Matrix"])
@@ -132,57 +153,64 @@ else:
     # --- 2. Interactive Exploration (Transient) ---
     st.subheader("🕵️ Interactive Data Exploration")
     
-    # Load Data Directly (Read-only, for plotting)
+    # Plot data is computed (and cached per dataset version) by the backend;
+    # only compact histograms / quantiles / top counts travel to the UI.
     try:
-        filepath = os.path.join(DATA_DIR, filename)
-        if os.path.exists(filepath):
-            if filename.endswith('.csv'):
-                df = pd.read_csv(filepath)
-            else:
-                df = pd.read_parquet(filepath)
+        response = requests.post(f"{API_URL}/eda/columns", json={"filename": filename})
+        if response.status_code == 200:
+            column_types = response.json()["column_types"]
             
-            # Boolean to string for categorical plotting
-            bool_cols = df.select_dtypes(include=['bool']).columns
-            for col in bool_cols:
-                df[col] = df[col].astype(str)
-                
             # Column Selection
-            all_columns = df.columns.tolist()
+            all_columns = list(column_types.keys())
             selected_col = st.selectbox("Select Column to Explore", all_columns)
             
             # Toggle for Integer -> Categorical
             treat_as_cat = False
-            if pd.api.types.is_integer_dtype(df[selected_col]):
+            if column_types[selected_col].startswith(("int", "uint")):
                 treat_as_cat = st.checkbox("Treat Integer as Categorical", value=False)
             
             if st.button(f"Explore '{selected_col}'"):
                 st.markdown(f"### Analysis of **{selected_col}**")
-                col_data = df[selected_col]
+                plot_response = requests.post(f"{API_URL}/eda/plot-data", json={
+                    "filename": filename,
+                    "column": selected_col,
+                    "treat_as_cat": treat_as_cat
+                })
+                if plot_response.status_code != 200:
+                    raise RuntimeError(plot_response.text)
+                plot = plot_response.json()
                 
                 # Visualizations
                 fig, ax = plt.subplots(figsize=(10, 6)) # Larger figure to accommodate overlapping
                 
-                is_numeric = pd.api.types.is_numeric_dtype(col_data) and not treat_as_cat
-                
-                if is_numeric:
+                if plot["kind"] == "numeric":
                     # Numeric: Histogram + Boxplot
                     plt.subplot(1, 2, 1)
-                    sns.histplot(col_data, kde=True)
+                    hist = plot["histogram"]
+                    plt.stairs(hist["counts"], hist["bin_edges"], fill=True)
                     plt.title("Distribution")
                     plt.xticks(rotation=90)
                     
                     plt.subplot(1, 2, 2)
-                    sns.boxplot(x=col_data)
+                    box = plot["box"]
+                    if box:
+                        plt.gca().bxp([{
+                            "med": box["median"], "q1": box["q1"], "q3": box["q3"],
+                            "whislo": box["whisker_low"], "whishi": box["whisker_high"], "fliers": []
+                        }], vert=False, showfliers=False)
+                        outliers = box["outliers_low"] + box["outliers_high"]
+                        if outliers:
+                            st.write(f"**Approx. outliers beyond the whiskers:** {outliers}")
                     plt.title("Boxplot")
                     plt.xticks(rotation=90)
                     
                 else:
                     # Categorical: Count Plot
                     # Top 10 Categories
-                    top_10 = col_data.value_counts().nlargest(10)
-                    total_count = len(col_data.dropna())
+                    top_10 = pd.Series({item["value"]: item["count"] for item in plot["top"]})
+                    total_count = plot["count"]
                     
-                    st.write(f"**Unique Categories:** {col_data.nunique()}")
+                    st.write(f"**Unique Categories:** {plot['unique']}")
                     
                     # Create plot
                     sns.barplot(x=top_10.index.astype(str), y=top_10.values, palette="viridis")
@@ -194,7 +222,7 @@ else:
                     # Dataframe for top 10
                     top_10_df = pd.DataFrame({
                         "Count": top_10.values,
-                        "Percent": (top_10.values / total_count * 100).round(2)
+                        "Percent": (top_10.values / max(total_count, 1) * 100).round(2)
                     }, index=top_10.index)
                     st.dataframe(top_10_df)
 
@@ -202,7 +230,7 @@ else:
                 st.pyplot(fig)
                 
         else:
-            st.error(f"File not found on server: {filepath}")
+            st.error(f"Could not load columns: {response.text}")
             
     except Exception as e:
         st.error(f"Could not load file for exploration: {e}")
@@ -62,6 +62,43 @@ if st.session_state.feature_plan:
             if not st.checkbox("Remove Step", key=f"del_{i}"):
                 updated_plan.append({"column": new_col, "operation": new_op, "reasoning": reason})
 
+    # Live preview: the edited plan on a sample of the data, refreshed whenever the plan changes
+    if st.checkbox("Live preview", value=True) and updated_plan:
+        preview_key = json.dumps([filename, [(s["column"], s["operation"]) for s in updated_plan]])
+        if st.session_state.get("preview_key") != preview_key:
+            try:
+                payload = {"filename": filename, "steps": updated_plan, "target_col": st.session_state.get("target")}
+                response = requests.post(f"{API_URL}/features/preview", json=payload)
+                st.session_state.preview = response.json() if response.status_code == 200 else {"error": response.text}
+            except Exception as e:
+                st.session_state.preview = {"error": str(e)}
+            st.session_state.preview_key = preview_key
+
+        preview = st.session_state.get("preview", {})
+        st.subheader("Preview")
+        if "error" in preview:
+            st.warning(f"Preview unavailable: {preview['error']}")
+        elif preview:
+            estimate = preview["estimated_output"]
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Rows", f"{estimate['rows']:,}")
+            m2.metric("Columns", estimate["columns"])
+            m3.metric("Memory (est.)", f"{estimate['memory_mb']} MB")
+            m4.metric("File size (est.)", f"{estimate['file_mb']} MB")
+            st.caption(f"Computed on a sample of {preview['sample_rows']:,} rows in {preview['elapsed_ms']} ms.")
+            if preview["new_columns"]:
+                st.write(f"New Columns: {preview['new_columns']}")
+            if preview["removed_columns"]:
+                st.write(f"Removed Columns: {preview['removed_columns']}")
+            rows = []
+            for col, stats in preview["stats"]["after"].items():
+                old = preview["stats"]["before"].get(col, {})
+                rows.append({"column": col, "dtype": stats["dtype"], "dtype (before)": old.get("dtype"),
+                             "missing": stats["missing"], "missing (before)": old.get("missing"),
+                             "mean": stats.get("mean"), "mean (before)": old.get("mean"),
+                             "std": stats.get("std"), "std (before)": old.get("std")})
+            st.dataframe(rows, use_container_width=True)
+
     if st.button("Apply Transformations"):
         with st.spinner("Applying changes..."):
             try: